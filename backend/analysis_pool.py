@@ -0,0 +1,207 @@
+"""
+Process-pool tier for CPU-bound video and audio analysis.
+
+DeepFace frame analysis and the wav2vec tone ensemble hold the GIL for long
+stretches, so running them inside the uvicorn worker starves every other
+request. With ANALYSIS_WORKERS > 0 they run in a pool of separate processes
+instead; each worker loads and warms its models once (in the pool initializer)
+and then serves tasks. FastAPI handlers submit tasks with AnalysisPool.run
+(async) or run_sync and get the result back.
+
+    ANALYSIS_WORKERS       worker processes (default 0 = run tasks in the API process)
+    ANALYSIS_QUEUE_SIZE    max tasks queued or running before new ones are rejected (default 4 per worker)
+    ANALYSIS_TIMEOUT_SEC   per-task timeout in seconds (default 300)
+    ANALYSIS_PRELOAD       models each worker loads up front (default "face,speech")
+    ANALYSIS_START_TIMEOUT_SEC  how long start() waits for every worker to be ready (default 600)
+
+Tasks look their models up with model(name), which returns the copy held by
+the current process's model registry: the worker's own, or (with
+ANALYSIS_WORKERS=0) the one the API process registered through register_local.
+"""
+import asyncio
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+from model_registry import registry
+
+
+class AnalysisPoolBusy(RuntimeError):
+    """Raised when the bounded task queue is full."""
+
+
+class AnalysisTimeout(RuntimeError):
+    """Raised when a task does not finish within its timeout."""
+
+
+def _load_face():
+    from video_emotion import EmotionDetector
+    return EmotionDetector()
+
+
+def _load_speech():
+    from process_audio_tone import SpeechProcessor
+    return SpeechProcessor()
+
+
+LOADERS = {"face": _load_face, "speech": _load_speech}
+for _name, _loader in LOADERS.items():
+    registry.register(_name, _loader)
+
+
+def register_local(name: str, value) -> None:
+    registry.put(name, value)
+
+
+def model(name: str):
+    return registry.get(name)
+
+
+def _init_worker(preload: tuple[str, ...], ready_queue) -> None:
+    for name in preload:
+        m = model(name)
+        if hasattr(m, "warmup"):
+            m.warmup()
+    print(f"analysis worker {os.getpid()} ready ({', '.join(preload) or 'no preload'})")
+    ready_queue.put(os.getpid())
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+# ---- tasks (module-level so they pickle by reference) ----
+
+def video_task(path: str):
+    from video_emotion import analyze_video
+    return analyze_video(path, model("face"))
+
+
+def tone_task(bucket_name: str, prefix: str):
+    return model("speech").process_gcs_frames(bucket_name=bucket_name, prefix=prefix)
+
+
+class AnalysisPool:
+    def __init__(self, workers: int | None = None, queue_size: int | None = None, timeout: float | None = None):
+        self.workers = int(os.getenv("ANALYSIS_WORKERS", "0")) if workers is None else workers
+        self.queue_size = queue_size or int(os.getenv("ANALYSIS_QUEUE_SIZE", str(max(1, self.workers) * 4)))
+        self.timeout = timeout or float(os.getenv("ANALYSIS_TIMEOUT_SEC", "300"))
+        self.start_timeout = float(os.getenv("ANALYSIS_START_TIMEOUT_SEC", "600"))
+        self.preload = tuple(
+            n.strip() for n in os.getenv("ANALYSIS_PRELOAD", "face,speech").split(",") if n.strip() in LOADERS
+        )
+        self._slots = threading.BoundedSemaphore(self.queue_size)
+        self._executor: ProcessPoolExecutor | None = None
+        self._ctx = multiprocessing.get_context("spawn")
+        self._ready_queue = self._ctx.Queue()
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.workers > 0
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        # spawn, not fork: the API process has TensorFlow/torch and loader threads running
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=self._ctx,
+            initializer=_init_worker,
+            initargs=(self.preload, self._ready_queue),
+        )
+
+    def start(self):
+        """
+        Spawn the workers and block until every one has loaded and warmed its
+        models. Raises AnalysisTimeout (and shuts the pool down) if that takes
+        longer than ANALYSIS_START_TIMEOUT_SEC.
+        """
+        with self._lock:
+            if self._executor is None:
+                self._executor = self._new_executor()
+            executor = self._executor
+        # Workers are spawned on demand, so submit one ping per worker; each worker
+        # reports on the ready queue once its initializer has warmed its models
+        deadline = time.monotonic() + self.start_timeout
+        try:
+            for fut in [executor.submit(_ping) for _ in range(self.workers)]:
+                fut.result(timeout=max(0.0, deadline - time.monotonic()))
+            pids = {self._ready_queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                    for _ in range(self.workers)}
+        except (FutureTimeout, queue.Empty):
+            # a worker died or hung while preloading; don't leave startup waiting on it
+            self.shutdown()
+            raise AnalysisTimeout(f"Analysis workers not ready after {self.start_timeout:g}s")
+        except BrokenProcessPool:
+            self.shutdown()
+            raise
+        print(f"Analysis pool ready: {len(pids)} workers")
+        return self
+
+    def _submit(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise AnalysisPoolBusy(f"Analysis queue is full ({self.queue_size} tasks)")
+        try:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = self._new_executor()
+                try:
+                    fut = self._executor.submit(fn, *args)
+                except BrokenProcessPool:
+                    # a worker died (e.g. OOM); replace the pool and retry once
+                    self._executor.shutdown(wait=False, cancel_futures=True)
+                    self._executor = self._new_executor()
+                    fut = self._executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        self.submitted += 1
+        fut.add_done_callback(lambda _: self._slots.release())
+        return fut
+
+    def run_sync(self, fn, *args, timeout: float | None = None):
+        """Run a task and block for its result (for sync handlers / threadpool code)."""
+        if not self.enabled:
+            return fn(*args)
+        fut = self._submit(fn, *args)
+        try:
+            return fut.result(timeout=timeout or self.timeout)
+        except FutureTimeout:
+            fut.cancel()
+            self.timed_out += 1
+            raise AnalysisTimeout(f"{fn.__name__} timed out after {timeout or self.timeout:g}s")
+
+    async def run(self, fn, *args, timeout: float | None = None):
+        """Run a task without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        if self.enabled:
+            fut = asyncio.wrap_future(self._submit(fn, *args))
+        else:
+            fut = loop.run_in_executor(None, fn, *args)
+        try:
+            return await asyncio.wait_for(fut, timeout or self.timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise AnalysisTimeout(f"{fn.__name__} timed out after {timeout or self.timeout:g}s")
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "submitted": self.submitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+        }
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
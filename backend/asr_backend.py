@@ -0,0 +1,173 @@
+"""
+Pluggable speech-recognition backends for the transcript pipeline.
+
+Every backend takes 16 kHz mono pydub AudioSegments (what speech_to_text.py
+produces after preprocessing) and offers the same entry points:
+
+    transcribe(segment)                 -> str
+    transcribe_batch(segments)          -> list[str], in input order
+    await transcribe_async(segment)
+    await transcribe_batch_async(segments)
+
+Backends, chosen with ASR_BACKEND:
+
+    google   Google Web Speech through speech_recognition (default); one remote
+             request per segment, ASR_WORKERS of them in flight at once
+    local    on-box CPU model loaded with transformers from ASR_MODEL_DIR (any
+             speech-recognition checkpoint, e.g. a Whisper or wav2vec2-CTC
+             directory); batches ASR_BATCH_SIZE segments per forward pass
+    stub     deterministic fake transcripts for load tests and offline
+             benchmarks; ASR_STUB_LATENCY_MS simulates a round trip
+
+Failures raise ASRError (never SystemExit), so a broken request only fails the
+transcript it belongs to.
+"""
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from model_registry import registry
+
+
+class ASRError(RuntimeError):
+    """Raised when a backend cannot transcribe a segment (network/API/model failure)."""
+
+
+def segment_samples(seg) -> np.ndarray:
+    """Mono float32 samples in [-1, 1] of a pydub segment."""
+    samples = np.asarray(seg.get_array_of_samples(), dtype=np.float32)
+    if seg.channels > 1:
+        samples = samples.reshape(-1, seg.channels).mean(axis=1)
+    return samples / float(1 << (8 * seg.sample_width - 1))
+
+
+class ASRBackend:
+    name = "base"
+
+    def __init__(self, language: str = "en-US", max_workers: int | None = None):
+        self.language = language
+        self.max_workers = max_workers or int(os.getenv("ASR_WORKERS", "4"))
+
+    def config_key(self) -> str:
+        """Identifies what determines this backend's output (used to key cached transcripts)."""
+        return f"{self.name}|{self.language}"
+
+    def transcribe(self, segment) -> str:
+        raise NotImplementedError
+
+    def transcribe_batch(self, segments) -> list[str]:
+        """Default: transcribe() on a bounded thread pool, results in input order."""
+        segments = list(segments)
+        if len(segments) <= 1 or self.max_workers <= 1:
+            return [self.transcribe(s) for s in segments]
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(segments)),
+                                thread_name_prefix=f"asr-{self.name}") as pool:
+            return list(pool.map(self.transcribe, segments))
+
+    async def transcribe_async(self, segment) -> str:
+        return await asyncio.get_running_loop().run_in_executor(None, self.transcribe, segment)
+
+    async def transcribe_batch_async(self, segments) -> list[str]:
+        return await asyncio.get_running_loop().run_in_executor(None, self.transcribe_batch, list(segments))
+
+
+class GoogleBackend(ASRBackend):
+    name = "google"
+
+    def transcribe(self, segment) -> str:
+        import speech_recognition as sr
+
+        audio = sr.AudioData(segment.raw_data, segment.frame_rate, segment.sample_width)
+        try:
+            res = sr.Recognizer().recognize_google(audio, language=self.language, show_all=True)
+        except sr.RequestError as e:
+            raise ASRError(f"Google speech API error: {e}") from e
+        except sr.UnknownValueError:
+            return ""
+        if isinstance(res, dict) and res.get("alternative"):
+            best = max(res["alternative"], key=lambda a: a.get("confidence", 0))
+            return (best.get("transcript") or "").strip()
+        return ""
+
+
+class LocalBackend(ASRBackend):
+    """transformers ASR pipeline on CPU, loaded once per process from a local directory."""
+
+    name = "local"
+
+    def __init__(self, language: str = "en-US", max_workers: int | None = None, model_dir: str | None = None):
+        super().__init__(language, max_workers)
+        self.model_dir = model_dir or os.getenv("ASR_MODEL_DIR")
+        if not self.model_dir or not os.path.isdir(self.model_dir):
+            raise ASRError(f"ASR_MODEL_DIR must point to a local model directory (got {self.model_dir!r})")
+        self.batch_size = int(os.getenv("ASR_BATCH_SIZE", "4"))
+        self.chunk_sec = float(os.getenv("ASR_CHUNK_SEC", "30"))
+        self._lock = threading.Lock()
+        self.pipe = registry.get(f"asr-local:{self.model_dir}", self._load)
+
+    def _load(self):
+        from transformers import pipeline
+        return pipeline("automatic-speech-recognition", model=self.model_dir, device=-1)
+
+    def config_key(self) -> str:
+        return (f"{self.name}|{self.language}|{os.path.abspath(self.model_dir)}"
+                f"|chunk={self.chunk_sec:g}")
+
+    def _inputs(self, segments):
+        return [{"raw": segment_samples(s), "sampling_rate": s.frame_rate} for s in segments]
+
+    def transcribe(self, segment) -> str:
+        return self.transcribe_batch([segment])[0]
+
+    def transcribe_batch(self, segments) -> list[str]:
+        segments = list(segments)
+        if not segments:
+            return []
+        try:
+            # One model, so calls are serialized; concurrency comes from batching instead
+            with self._lock:
+                out = self.pipe(self._inputs(segments), batch_size=self.batch_size, chunk_length_s=self.chunk_sec)
+        except Exception as e:
+            raise ASRError(f"Local ASR failed: {e}") from e
+        return [(o.get("text") or "").strip() for o in out]
+
+
+class StubBackend(ASRBackend):
+    """Deterministic transcripts (same audio -> same text) with optional simulated latency."""
+
+    name = "stub"
+    WORDS = ("i", "feel", "really", "tired", "today", "and", "work", "has", "been", "stressful", "lately", "okay")
+
+    def __init__(self, language: str = "en-US", max_workers: int | None = None):
+        super().__init__(language, max_workers)
+        self.latency = float(os.getenv("ASR_STUB_LATENCY_MS", "0")) / 1000.0
+
+    def transcribe(self, segment) -> str:
+        if self.latency:
+            time.sleep(self.latency)
+        digest = hashlib.sha1(segment.raw_data).digest()
+        n_words = max(1, int(len(segment) / 1000 * 2))  # ~2 words per second of audio
+        return " ".join(self.WORDS[digest[i % len(digest)] % len(self.WORDS)] for i in range(n_words))
+
+
+BACKENDS = {"google": GoogleBackend, "local": LocalBackend, "stub": StubBackend}
+
+_backends: dict = {}
+_backends_lock = threading.Lock()
+
+
+def get_backend(name: str | None = None, language: str = "en-US") -> ASRBackend:
+    """The process-wide backend called `name` (default ASR_BACKEND, else google)."""
+    name = (name or os.getenv("ASR_BACKEND", "google")).lower()
+    if name not in BACKENDS:
+        raise ASRError(f"Unknown ASR backend '{name}' (choose from {', '.join(BACKENDS)})")
+    key = (name, language)
+    with _backends_lock:
+        if key not in _backends:
+            _backends[key] = BACKENDS[name](language=language)
+        return _backends[key]
@@ -0,0 +1,102 @@
+"""
+GCS download and audio decode helpers shared by the tone and transcript pipelines.
+
+- One google.cloud.storage client per process (gcs_client), instead of a new
+  client, connection pool and credential lookup on every helper call.
+- Blobs are fetched with download_as_bytes on a bounded thread pool
+  (GCS_DOWNLOAD_WORKERS), so fetching N chunks takes about as long as the
+  slowest one rather than the sum.
+- Audio is decoded straight from those bytes by piping them through ffmpeg,
+  never touching a temp file, and the decoded PCM is kept in the on-disk
+  PCM cache (fetch_pcm) so tone analysis and transcription share one decode.
+
+    GCS_DOWNLOAD_WORKERS   concurrent downloads per call (default 8)
+"""
+import io
+import os
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from pcm_cache import pcm_cache
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def gcs_client():
+    """The process-wide storage client (created on first use)."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from google.cloud import storage
+                _client = storage.Client()
+    return _client
+
+
+def map_bounded(fn, items, max_workers: int | None = None) -> list:
+    """
+    fn(item) for every item on a bounded thread pool, in input order. A call
+    that raises yields its exception in place of a result.
+    """
+    items = list(items)
+    if not items:
+        return []
+    workers = max_workers or int(os.getenv("GCS_DOWNLOAD_WORKERS", "8"))
+
+    def call(item):
+        try:
+            return fn(item)
+        except Exception as e:
+            return e
+
+    if workers <= 1 or len(items) == 1:
+        return [call(item) for item in items]
+    with ThreadPoolExecutor(max_workers=min(workers, len(items)), thread_name_prefix="gcs-fetch") as pool:
+        return list(pool.map(call, items))
+
+
+def ffmpeg_decode(data: bytes, fmt: str = "wav", sr: int = 16000, tolerant: bool = False) -> bytes:
+    """Transcode encoded audio bytes to mono `sr` Hz output in `fmt` (e.g. wav, f32le) via stdin/stdout."""
+    cmd = ["ffmpeg", "-v", "error"]
+    if tolerant:
+        cmd += ["-fflags", "+genpts+discardcorrupt", "-err_detect", "ignore_err"]
+    cmd += ["-i", "pipe:0", "-ac", "1", "-ar", str(sr), "-f", fmt, "pipe:1"]
+    proc = subprocess.run(cmd, input=data, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, cmd, output=proc.stdout, stderr=proc.stderr)
+    return proc.stdout
+
+
+def decode_pcm(data: bytes, sr: int = 16000, tolerant: bool = False) -> np.ndarray:
+    """Decode encoded audio bytes (webm, wav, mp3, ...) to mono float32 PCM at `sr` Hz."""
+    try:
+        return np.frombuffer(ffmpeg_decode(data, fmt="f32le", sr=sr, tolerant=tolerant), dtype=np.float32).copy()
+    except FileNotFoundError:
+        # no ffmpeg binary: let librosa/soundfile handle what it can (wav, flac, ogg)
+        import librosa
+        y, _ = librosa.load(io.BytesIO(data), sr=sr, mono=True)
+        return y.astype(np.float32, copy=False)
+
+
+def decode_pcm_robust(data: bytes, sr: int = 16000) -> np.ndarray:
+    """decode_pcm, retrying with ffmpeg's error-tolerant flags (for truncated or partial chunks)."""
+    try:
+        return decode_pcm(data, sr)
+    except subprocess.CalledProcessError:
+        return decode_pcm(data, sr, tolerant=True)
+
+
+def fetch_pcm(bucket_name: str, key: str, generation=None, blob=None) -> np.ndarray:
+    """
+    16 kHz mono float32 PCM of a GCS object, through the shared on-disk PCM
+    cache (pcm_cache.py): only a miss downloads and decodes.
+    """
+    def decode():
+        # pin the generation the cache entry is keyed on, so a newer upload is never stored under it
+        source = blob if blob is not None else gcs_client().bucket(bucket_name).blob(key, generation=generation)
+        return decode_pcm_robust(source.download_as_bytes(), sr=16000)
+    return pcm_cache().get_or_decode(bucket_name, key, generation, decode)
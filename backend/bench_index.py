@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Recall / latency benchmark for the retriever's FAISS index types.
+
+Every candidate index is compared against the exact flat index on the same
+queries and reports recall@TOP_K plus p50/p99 single-query search latency,
+which is how retrieve_chunks searches in production.
+
+Queries are real sentences from --queries (one per line, encoded with the
+retriever's SentenceTransformer) or, by default, perturbed copies of random
+document embeddings so the benchmark runs without downloading a model.
+
+    python backend/bench_index.py --kinds flat hnsw ivf ivfpq
+    python backend/bench_index.py --queries my_queries.txt --top-k 5
+"""
+import argparse
+import time
+
+import numpy as np
+
+from chunk_store import DEFAULT_EMBEDDINGS_PATH
+from vector_index import INDEX_KINDS, build_index, index_settings
+
+TOP_K = 5
+
+
+def synthetic_queries(embeddings: np.ndarray, n: int, noise: float, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    picks = embeddings[rng.integers(0, embeddings.shape[0], size=n)]
+    queries = picks + rng.normal(scale=noise, size=picks.shape).astype(np.float32)
+    return queries.astype(np.float32)
+
+
+def encoded_queries(path: str) -> np.ndarray:
+    from sentence_transformers import SentenceTransformer
+
+    with open(path) as f:
+        lines = [line.strip() for line in f if line.strip()]
+    return SentenceTransformer("all-mpnet-base-v2").encode(lines, convert_to_numpy=True).astype(np.float32)
+
+
+def time_searches(index, queries: np.ndarray, top_k: int):
+    ids = np.empty((queries.shape[0], top_k), dtype=np.int64)
+    latencies = np.empty(queries.shape[0])
+    for i in range(queries.shape[0]):
+        t0 = time.perf_counter()
+        _, I = index.search(queries[i:i + 1], top_k)
+        latencies[i] = (time.perf_counter() - t0) * 1000
+        ids[i] = I[0]
+    return ids, latencies
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    hits = [len(set(f) & set(t)) / len(t) for f, t in zip(found, truth)]
+    return float(np.mean(hits))
+
+
+def main():
+    import faiss
+
+    parser = argparse.ArgumentParser(description="Benchmark FAISS index types against the flat baseline")
+    parser.add_argument("--kinds", nargs="+", choices=INDEX_KINDS, default=list(INDEX_KINDS))
+    parser.add_argument("--embeddings", default=DEFAULT_EMBEDDINGS_PATH)
+    parser.add_argument("--queries", default=None, help="text file with one query per line")
+    parser.add_argument("--num-queries", type=int, default=500)
+    parser.add_argument("--noise", type=float, default=0.05, help="std-dev for synthetic query perturbation")
+    parser.add_argument("--top-k", type=int, default=TOP_K)
+    args = parser.parse_args()
+
+    embeddings = np.load(args.embeddings).astype(np.float32)
+    faiss.normalize_L2(embeddings)
+    queries = encoded_queries(args.queries) if args.queries else synthetic_queries(embeddings, args.num_queries, args.noise)
+    faiss.normalize_L2(queries)
+    print(f"{embeddings.shape[0]} vectors x {embeddings.shape[1]} dims, {queries.shape[0]} queries, top_k={args.top_k}")
+
+    baseline = build_index(embeddings, index_settings("flat"))
+    truth, _ = time_searches(baseline, queries, args.top_k)
+
+    print(f"\n{'index':8} {'build_s':>8} {'recall@k':>9} {'p50_ms':>8} {'p99_ms':>8}")
+    for kind in args.kinds:
+        t0 = time.perf_counter()
+        index = build_index(embeddings, index_settings(kind))
+        build_s = time.perf_counter() - t0
+        found, latencies = time_searches(index, queries, args.top_k)
+        print(f"{kind:8} {build_s:8.2f} {recall_at_k(found, truth):9.3f} "
+              f"{np.percentile(latencies, 50):8.3f} {np.percentile(latencies, 99):8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Offline build step for the DSM-5 chunk store.
+
+Parses DSM5.pdf once, reproduces the retriever's CHUNK_SIZE-word chunking and
+writes the memory-mappable store read by chunk_store.ChunkStore. Run it
+whenever DSM5.pdf or document_embeddings.npy changes:
+
+    python backend/build_chunk_store.py              # check against existing embeddings
+    python backend/build_chunk_store.py --reembed    # also regenerate the embeddings
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+from chunk_store import (
+    BACKEND_DIR,
+    CHUNK_SIZE,
+    DEFAULT_EMBEDDINGS_PATH,
+    DEFAULT_STORE_PREFIX,
+    file_sha256,
+    store_exists,
+    write_store,
+)
+from file_lock import file_lock
+
+PDF_PATH = os.path.join(BACKEND_DIR, "DSM5.pdf")
+EMBED_MODEL_NAME = "all-mpnet-base-v2"
+
+
+def chunk_pdf(pdf_path: str, chunk_size: int = CHUNK_SIZE) -> list[tuple[str, int, int]]:
+    """
+    Split the PDF into chunk_size-word chunks, returning (text, page_start, page_end).
+    Words are taken page by page, which yields exactly the chunks the old
+    in-process `text.split()` produced while remembering where each came from.
+    """
+    import PyPDF2
+
+    words, word_pages = [], []
+    with open(pdf_path, "rb") as f:
+        reader = PyPDF2.PdfReader(f)
+        for page_no, page in enumerate(reader.pages, 1):
+            page_text = page.extract_text()
+            if not page_text:
+                continue
+            page_words = page_text.split()
+            words.extend(page_words)
+            word_pages.extend([page_no] * len(page_words))
+
+    chunks = []
+    for i in range(0, len(words), chunk_size):
+        chunks.append((" ".join(words[i:i + chunk_size]), word_pages[i], word_pages[min(i + chunk_size, len(words)) - 1]))
+    return chunks
+
+
+def build(pdf_path: str = PDF_PATH, prefix: str = DEFAULT_STORE_PREFIX,
+          embeddings_path: str = DEFAULT_EMBEDDINGS_PATH, reembed: bool = False,
+          if_missing: bool = False) -> dict | None:
+    """
+    Build the store under file_lock(prefix), so concurrent builders (workers
+    booting together, or this script run during a boot) take turns. With
+    `if_missing`, a store finished by whoever held the lock first is kept.
+    """
+    with file_lock(prefix):
+        if if_missing and store_exists(prefix):
+            print(f"Chunk store {prefix} was built by another process")
+            return None
+        return _build(pdf_path, prefix, embeddings_path, reembed)
+
+
+def _build(pdf_path: str, prefix: str, embeddings_path: str, reembed: bool) -> dict:
+    t0 = time.time()
+    chunks = chunk_pdf(pdf_path)
+    print(f"Chunked {pdf_path}: {len(chunks)} chunks in {time.time() - t0:.1f}s")
+
+    if reembed:
+        from sentence_transformers import SentenceTransformer
+        embed_model = SentenceTransformer(EMBED_MODEL_NAME)
+        embeddings = embed_model.encode([c[0] for c in chunks], convert_to_numpy=True, show_progress_bar=True)
+        np.save(embeddings_path, embeddings.astype(np.float32))
+        print(f"Wrote {embeddings_path}: {embeddings.shape}")
+
+    embeddings = np.load(embeddings_path, mmap_mode="r")
+    if embeddings.shape[0] != len(chunks):
+        raise SystemExit(
+            f"{embeddings_path} has {embeddings.shape[0]} rows but the PDF produced {len(chunks)} chunks; "
+            "run again with --reembed"
+        )
+
+    meta = {
+        "source_pdf": os.path.basename(pdf_path),
+        "source_sha256": file_sha256(pdf_path),
+        "chunk_size": CHUNK_SIZE,
+        "embeddings_file": os.path.basename(embeddings_path),
+        "embeddings_sha256": file_sha256(embeddings_path),
+        "embedding_dim": int(embeddings.shape[1]),
+        "embed_model": EMBED_MODEL_NAME,
+        "built_at": int(time.time()),
+    }
+    write_store(prefix, chunks, meta)
+    print(f"Wrote chunk store {prefix}.{{bin,idx.npy,json}} in {time.time() - t0:.1f}s")
+    return meta
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the memory-mapped DSM-5 chunk store")
+    parser.add_argument("--pdf", default=PDF_PATH)
+    parser.add_argument("--out", default=DEFAULT_STORE_PREFIX, help="store path prefix")
+    parser.add_argument("--embeddings", default=DEFAULT_EMBEDDINGS_PATH)
+    parser.add_argument("--reembed", action="store_true", help=f"re-encode chunks with {EMBED_MODEL_NAME}")
+    args = parser.parse_args()
+    build(args.pdf, args.out, args.embeddings, args.reembed)
+
+
+if __name__ == "__main__":
+    main()
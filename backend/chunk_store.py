@@ -0,0 +1,147 @@
+"""
+Memory-mapped store for the DSM-5 text chunks used by the RAG retriever.
+
+The store is produced offline by build_chunk_store.py and lives next to
+document_embeddings.npy as three files sharing one prefix:
+
+    dsm5_chunks.bin       UTF-8 chunk text, written back to back
+    dsm5_chunks.idx.npy   one (offset, length, page_start, page_end) row per chunk
+    dsm5_chunks.json      format version, chunk size, sizes and embeddings fingerprint
+
+Row i of the index matches row i of document_embeddings.npy, so a FAISS id can
+be turned into chunk text by slicing the mapped blob; nothing else is decoded.
+"""
+import hashlib
+import json
+import mmap
+import os
+
+import numpy as np
+
+from file_lock import temp_path
+
+STORE_VERSION = 1
+CHUNK_SIZE = 300  # words per chunk
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_STORE_PREFIX = os.getenv("CHUNK_STORE_PREFIX", os.path.join(BACKEND_DIR, "dsm5_chunks"))
+DEFAULT_EMBEDDINGS_PATH = os.path.join(BACKEND_DIR, "document_embeddings.npy")
+
+INDEX_DTYPE = np.dtype([
+    ("offset", "<u8"),
+    ("length", "<u4"),
+    ("page_start", "<u4"),
+    ("page_end", "<u4"),
+])
+
+
+def file_sha256(path: str, block_size: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def store_exists(prefix: str = DEFAULT_STORE_PREFIX) -> bool:
+    return all(os.path.exists(prefix + ext) for ext in (".bin", ".idx.npy", ".json"))
+
+
+def write_store(prefix: str, chunks: list[tuple[str, int, int]], meta: dict) -> None:
+    """
+    Write (text, page_start, page_end) chunks to the store at `prefix`.
+    Each file is written under its own temporary name and renamed into place,
+    the metadata last: it records the chunk count and text size, which
+    ChunkStore checks, so a reader never accepts a half-replaced store.
+    Callers building concurrently should hold file_lock(prefix) (see
+    build_chunk_store.build).
+    """
+    index = np.zeros(len(chunks), dtype=INDEX_DTYPE)
+    offset = 0
+    tmp_bin, tmp_idx, tmp_meta = (temp_path(prefix + ext) for ext in (".bin", ".idx.npy", ".json"))
+    try:
+        with open(tmp_bin, "wb") as f:
+            for i, (text, page_start, page_end) in enumerate(chunks):
+                data = text.encode("utf-8")
+                f.write(data)
+                index[i] = (offset, len(data), page_start, page_end)
+                offset += len(data)
+        with open(tmp_idx, "wb") as f:
+            np.save(f, index)
+
+        meta = dict(meta, version=STORE_VERSION, num_chunks=len(chunks), text_bytes=offset)
+        with open(tmp_meta, "w") as f:
+            json.dump(meta, f, indent=2)
+
+        os.replace(tmp_bin, prefix + ".bin")
+        os.replace(tmp_idx, prefix + ".idx.npy")
+        os.replace(tmp_meta, prefix + ".json")
+    finally:
+        for tmp in (tmp_bin, tmp_idx, tmp_meta):
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+
+class ChunkStore:
+    """Read-only, lazily decoded view over a chunk store on disk."""
+
+    def __init__(self, prefix: str = DEFAULT_STORE_PREFIX):
+        self.prefix = prefix
+        with open(prefix + ".json") as f:
+            self.meta = json.load(f)
+        if self.meta.get("version") != STORE_VERSION:
+            raise ValueError(
+                f"Chunk store {prefix} has version {self.meta.get('version')}, expected {STORE_VERSION}; "
+                "rebuild it with build_chunk_store.py"
+            )
+
+        self.index = np.load(prefix + ".idx.npy", mmap_mode="r")
+        self._file = open(prefix + ".bin", "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        if self.index.shape[0] != self.meta.get("num_chunks") or size != self.meta.get("text_bytes"):
+            self._file.close()
+            raise ValueError(
+                f"Chunk store {prefix} is incomplete ({self.index.shape[0]} chunks / {size} bytes on disk, "
+                f"metadata says {self.meta.get('num_chunks')} / {self.meta.get('text_bytes')}); "
+                "rebuild it with build_chunk_store.py"
+            )
+        self._buf = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def __len__(self) -> int:
+        return int(self.index.shape[0])
+
+    def __getitem__(self, i: int) -> str:
+        row = self.index[i]
+        start = int(row["offset"])
+        return self._buf[start:start + int(row["length"])].decode("utf-8")
+
+    def pages(self, i: int) -> tuple[int, int]:
+        """1-based (first, last) PDF page spanned by chunk i."""
+        row = self.index[i]
+        return int(row["page_start"]), int(row["page_end"])
+
+    def get_many(self, ids) -> list[str]:
+        return [self[int(i)] for i in ids if 0 <= int(i) < len(self)]
+
+    def check_embeddings(self, embeddings: np.ndarray, path: str | None = None) -> None:
+        """
+        Make sure the store and the embeddings describe the same chunks.
+        Shape is always checked; pass `path` to also compare the file hash
+        recorded at build time.
+        """
+        if embeddings.shape[0] != len(self):
+            raise ValueError(
+                f"Chunk store has {len(self)} chunks but embeddings have {embeddings.shape[0]} rows; "
+                "rebuild with build_chunk_store.py"
+            )
+        expected_dim = self.meta.get("embedding_dim")
+        if expected_dim is not None and embeddings.shape[1] != expected_dim:
+            raise ValueError(f"Embedding dim {embeddings.shape[1]} does not match store ({expected_dim})")
+        expected_hash = self.meta.get("embeddings_sha256")
+        if path and expected_hash and file_sha256(path) != expected_hash:
+            raise ValueError(f"{path} changed since the chunk store was built; rebuild with build_chunk_store.py")
+
+    def close(self) -> None:
+        if isinstance(self._buf, mmap.mmap):
+            self._buf.close()
+        self._file.close()
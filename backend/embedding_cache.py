@@ -0,0 +1,126 @@
+"""
+Bounded LRU cache of query embeddings, keyed by normalized query text.
+
+Repeated queries (e.g. the same newest transcript coming back through
+/process_speech and /detect_video_emotions) are answered from memory and never
+reach the SentenceTransformer. The cache can optionally be saved to an .npz
+file on shutdown and reloaded on the next boot.
+
+    EMBED_CACHE_SIZE   max cached queries (default 1024, 0 disables caching)
+    EMBED_CACHE_PATH   .npz file to persist the cache across restarts (unset = memory only)
+"""
+import os
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+_WS = re.compile(r"\s+")
+# Stored in saved caches; files written with a different normalize_query are not loaded
+KEY_FORMAT = 2
+
+
+def normalize_query(text: str) -> str:
+    """
+    Cache key for a query: surrounding whitespace stripped and inner runs
+    collapsed, which the tokenizer ignores anyway. Case and Unicode forms are
+    kept, so two keys never map texts the encoder would embed differently.
+    """
+    return _WS.sub(" ", text or "").strip()
+
+
+class EmbeddingCache:
+    def __init__(self, max_size: int | None = None, path: str | None = None):
+        self.max_size = int(os.getenv("EMBED_CACHE_SIZE", "1024")) if max_size is None else max_size
+        self.path = path if path is not None else (os.getenv("EMBED_CACHE_PATH") or None)
+        self._data: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, text: str) -> np.ndarray | None:
+        key = normalize_query(text)
+        with self._lock:
+            vec = self._data.get(key)
+            if vec is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return vec
+
+    def put(self, text: str, vec: np.ndarray) -> None:
+        if self.max_size <= 0:
+            return
+        key = normalize_query(text)
+        vec = np.asarray(vec, dtype=np.float32)
+        vec.setflags(write=False)
+        with self._lock:
+            self._data[key] = vec
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def encode(self, texts: list[str], encode_fn) -> np.ndarray:
+        """
+        Return a (len(texts), dim) float32 array, calling `encode_fn(list_of_texts)`
+        once for the cache misses only; a query repeated within the batch is
+        encoded once.
+        """
+        cached = [self.get(t) for t in texts]
+        missing: dict[str, list[int]] = {}
+        for i, vec in enumerate(cached):
+            if vec is None:
+                missing.setdefault(normalize_query(texts[i]), []).append(i)
+        if missing:
+            groups = list(missing.values())
+            fresh = np.asarray(encode_fn([texts[idx[0]] for idx in groups]), dtype=np.float32)
+            for idx, vec in zip(groups, fresh):
+                self.put(texts[idx[0]], vec)
+                for i in idx:
+                    cached[i] = vec
+        return np.stack(cached).astype(np.float32, copy=True)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / total) if total else 0.0,
+        }
+
+    def load(self, path: str | None = None) -> int:
+        """Load a previously saved cache; returns the number of entries restored."""
+        path = path or self.path
+        if not path or not os.path.exists(path) or self.max_size <= 0:
+            return 0
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                keys, vectors = data["keys"], data["vectors"]
+                key_format = int(data["key_format"]) if "key_format" in data.files else 1
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Ignoring unreadable embedding cache {path}: {e}")
+            return 0
+        if key_format != KEY_FORMAT:
+            print(f"Ignoring embedding cache {path}: saved with key format {key_format}, expected {KEY_FORMAT}")
+            return 0
+        for key, vec in zip(keys[-self.max_size:], vectors[-self.max_size:]):
+            self.put(str(key), vec)
+        return len(self._data)
+
+    def save(self, path: str | None = None) -> None:
+        path = path or self.path
+        if not path or not self._data:
+            return
+        with self._lock:
+            keys = np.array(list(self._data.keys()))
+            vectors = np.stack(list(self._data.values()))
+        tmp = path + ".tmp.npz"
+        np.savez(tmp, keys=keys, vectors=vectors, key_format=np.array(KEY_FORMAT))
+        os.replace(tmp, path)
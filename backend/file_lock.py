@@ -0,0 +1,42 @@
+"""
+Cross-process helpers for build artifacts written next to the code.
+
+Several uvicorn workers can boot at once and find the same artifact (chunk
+store, FAISS index) missing. file_lock serializes them on an advisory lock
+file so one builds and the others wait and then load its result, and
+temp_path gives every writer its own temporary file in the target directory,
+so renames stay atomic and two writers never share a half-written file.
+
+Locking uses fcntl.flock and is a no-op where fcntl is unavailable (Windows).
+"""
+import os
+import tempfile
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX
+    fcntl = None
+
+
+@contextmanager
+def file_lock(path: str):
+    """Hold an exclusive lock on `path` + ".lock" for the duration of the block."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path + ".lock", "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def temp_path(path: str) -> str:
+    """A new, uniquely named empty file in `path`'s directory, to be renamed onto `path`."""
+    directory, name = os.path.split(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(prefix=f".{name}.", suffix=".tmp", dir=directory)
+    os.close(fd)
+    os.chmod(tmp, 0o644)  # mkstemp creates 0600; the renamed file should read like any other
+    return tmp
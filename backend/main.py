@@ -3,44 +3,172 @@ import time
 from dotenv import load_dotenv
 load_dotenv(override=True)
 
-from fastapi import FastAPI, File, UploadFile
+from fastapi import FastAPI, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-import cv2
-from deepface import DeepFace
+from python_multipart.multipart import MultipartParser, parse_options_header
 from collections import Counter
 import tempfile
 import uvicorn
-import PyPDF2
-from sentence_transformers import SentenceTransformer
-import faiss
-import google.generativeai as genai
 import numpy as np
-import speech_recognition as sr
-from pydub import AudioSegment, effects
-from pydub.effects import high_pass_filter, low_pass_filter, compress_dynamic_range
-from process_audio_tone import SpeechProcessor
-from speech_to_text import transcribe_latest_concat
+from pydub import AudioSegment
+from speech_to_text import recognize_chunks, transcribe_latest_concat
+from audio_preprocess import pcm_to_segment, preprocess_pcm, segment_to_pcm
+from vad import segment_pcm
 from pymongo import MongoClient
 from mongodb_fetcher import fetch_all_from_mongo
+from embedding_cache import EmbeddingCache
+from query_batcher import MicroBatcher
+from startup import ComponentLoader, ComponentNotReady
+from model_registry import registry as model_registry
+from pcm_cache import pcm_cache
+from transcript_cache import transcript_cache
+from video_emotion import EmotionDetector
+from analysis_pool import (
+    AnalysisPool, AnalysisPoolBusy, AnalysisTimeout, register_local, tone_task, video_task,
+)
+
+# Heavy libraries (TensorFlow via deepface, torch/transformers, sentence_transformers,
+# faiss, cv2, google.generativeai) are imported inside the loaders below and
+# loaded concurrently in background threads once the app starts.
 
 # Configuration
 mongo_db = os.getenv("MONGO_DB", "coach")
 default_bucket = os.getenv("GCS_BUCKET")
 print(f"🚀 Backend starting with GCS_BUCKET: {default_bucket}")
 
+TOP_K = 5
+CHUNK_SEC = 30 
+LANG = "en-US" 
+EMBEDDINGS_PATH = os.path.join(os.path.dirname(__file__), "document_embeddings.npy")
+VIDEO_MAX_UPLOAD_BYTES = int(float(os.getenv("VIDEO_MAX_UPLOAD_MB", "200")) * 1024 * 1024)
+
 app = FastAPI(title="Mental Wellness & Emotion Detection API")
-speech_processor = SpeechProcessor()
+
+
+def load_embedder():
+    from sentence_transformers import SentenceTransformer
+    return model_registry.get("sentence-transformer:all-mpnet-base-v2",
+                              lambda: SentenceTransformer("all-mpnet-base-v2"))
+
+def load_rag_index():
+    import faiss
+    from chunk_store import ChunkStore, store_exists
+    from vector_index import load_or_build_index
+
+    # Chunk text comes from the prebuilt, memory-mapped store (see build_chunk_store.py).
+    # The first boot without a store builds it once so later workers start instantly;
+    # workers booting together wait on the build lock and load the finished store.
+    if not store_exists():
+        from build_chunk_store import build as build_chunk_store
+        print("Chunk store missing, building it from DSM5.pdf (one-time)...")
+        build_chunk_store(if_missing=True)
+    chunk_store = ChunkStore()
+
+    doc_embeddings = np.load(EMBEDDINGS_PATH)
+    faiss.normalize_L2(doc_embeddings)
+    chunk_store.check_embeddings(
+        doc_embeddings,
+        path=EMBEDDINGS_PATH if os.getenv("CHUNK_STORE_VERIFY") == "1" else None,
+    )
+    print("Embeddings shape:", doc_embeddings.shape)
+    print("Total chunks:", len(chunk_store))
+
+    # Index type is chosen with FAISS_INDEX_KIND (flat | hnsw | ivf | ivfpq); see vector_index.py
+    index = load_or_build_index(doc_embeddings, fingerprint=chunk_store.meta.get("embeddings_sha256"))
+    return chunk_store, index
+
+def load_speech_processor():
+    from process_audio_tone import SpeechProcessor
+    speech_processor = SpeechProcessor()
+    register_local("speech", speech_processor)
+    return speech_processor
+
+def load_face_detector():
+    detector = EmotionDetector()
+    register_local("face", detector)
+    return detector
+
+def load_llm():
+    import google.generativeai as genai
+    genai.configure(api_key=os.getenv("GOOGLE_API_KEY", ""))
+    return genai.GenerativeModel('gemini-2.5-flash')
+
+
+def warmup_embedder(embed_model):
+    embed_model.encode(["How can I cope with feeling anxious before work?"], convert_to_numpy=True)
+
+def warmup_rag_index(rag):
+    chunk_store, index = rag
+    index.search(np.zeros((1, index.d), dtype=np.float32), TOP_K)
+
+def warmup_speech_processor(speech_processor):
+    speech_processor.warmup()
+
+def warmup_face_detector(detector):
+    detector.warmup()
+
+
+# Every model gets a synthetic input (dummy query, zero vector, a second of noise,
+# a blank frame) before it is reported ready; set WARMUP_ENABLED=0 to skip.
+components = ComponentLoader()
+components.register("embedder", load_embedder, warmup=warmup_embedder)
+components.register("rag_index", load_rag_index, warmup=warmup_rag_index)
+components.register("llm", load_llm)
+
+# Video and tone analysis run in a pool of worker processes when ANALYSIS_WORKERS > 0
+# (each worker loads and warms its own models); otherwise in this process.
+analysis_pool = AnalysisPool()
+if analysis_pool.enabled:
+    components.register("analysis_workers", analysis_pool.start)
+    FACE_COMPONENT = SPEECH_COMPONENT = "analysis_workers"
+else:
+    components.register("speech", load_speech_processor, warmup=warmup_speech_processor)
+    components.register("face", load_face_detector, warmup=warmup_face_detector)
+    FACE_COMPONENT, SPEECH_COMPONENT = "face", "speech"
+
+@app.on_event("startup")
+def start_background_loading():
+    components.start()
+
+@app.exception_handler(ComponentNotReady)
+def component_not_ready(request, exc: ComponentNotReady):
+    return JSONResponse(
+        {"error": str(exc), "components": components.status()},
+        status_code=503,
+        headers={"Retry-After": "5"},
+    )
 
 @app.get("/")
 def read_root():
     return {
-        "status": "ok", 
+        "status": "ok" if components.is_ready() else "starting", 
         "message": "Mental Wellness API is running", 
         "gcs_bucket": default_bucket,
-        "mongo_db": mongo_db
+        "mongo_db": mongo_db,
+        "components": components.status(),
+        "embedding_cache": embed_cache.stats(),
+        "rag_batching": query_batcher.stats(),
+        "analysis_pool": analysis_pool.stats(),
+        "models": model_registry.stats(),
+        "pcm_cache": pcm_cache().stats(),
+        "transcript_cache": transcript_cache().stats(),
     }
 
+@app.get("/ready")
+def ready():
+    """Readiness probe: 200 only after every model is loaded and warmed up, 503 before that."""
+    readiness = components.readiness()
+    return JSONResponse(readiness, status_code=200 if readiness["ready"] else 503)
+
+@app.on_event("shutdown")
+def shutdown_services():
+    # Stop taking batched searches and analysis jobs, then persist the query-embedding cache
+    query_batcher.close()
+    analysis_pool.shutdown()
+    embed_cache.save()
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -49,20 +177,6 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY", ""))
-model = genai.GenerativeModel('gemini-2.5-flash')
-
-class EmotionDetector:
-    @staticmethod
-    def detect_emotion(frame):
-        try:
-            result = DeepFace.analyze(frame, actions=['emotion'], enforce_detection=False)
-            return result[0]['dominant_emotion']
-        except:
-            return "No face"
-
-detector = EmotionDetector()
-
 CRISIS_TERMS = {"suicide", "kill myself", "end my life", "self harm", "overdose", "hurt myself"}
 
 def is_high_risk(text: str) -> bool:
@@ -70,90 +184,53 @@ def is_high_risk(text: str) -> bool:
     return any(term in text for term in CRISIS_TERMS)
 
 
-PDF_PATH = os.path.join(os.path.dirname(__file__), "DSM5.pdf")
-CHUNK_SIZE = 300
-TOP_K = 5
-CHUNK_SEC = 30 
-LANG = "en-US" 
-
-# Load and chunk text
-text = ""
-with open(PDF_PATH, "rb") as f:
-    reader = PyPDF2.PdfReader(f)
-    for page in reader.pages:
-        page_text = page.extract_text()
-        if page_text:
-            text += page_text + "\n"
+# Repeated queries skip the transformer; see embedding_cache.py for EMBED_CACHE_SIZE / EMBED_CACHE_PATH
+embed_cache = EmbeddingCache()
+print("Embedding cache entries restored:", embed_cache.load())
 
-words = text.split()
-chunked_docs = [" ".join(words[i:i+CHUNK_SIZE]) for i in range(0, len(words), CHUNK_SIZE)]
+def encode_queries(queries):
+    return embed_cache.encode(
+        queries,
+        lambda texts: components.require("embedder").encode(texts, convert_to_numpy=True),
+    )
 
+def search_batch(requests):
+    """Encode and search a batch of (query, top_k) requests with one encode and one index.search."""
+    import faiss
 
-embed_model = SentenceTransformer("all-mpnet-base-v2")
-
-doc_embeddings = np.load(os.path.join(os.path.dirname(__file__), "document_embeddings.npy"))
-faiss.normalize_L2(doc_embeddings)
-print("Embeddings shape:", doc_embeddings.shape)
-print("Total chunks:", len(chunked_docs))
+    chunk_store, index = components.require("rag_index")
+    queries = [q for q, _ in requests]
+    k = max(top_k for _, top_k in requests)
+    q_emb = encode_queries(queries)
+    faiss.normalize_L2(q_emb)
+    D, I = index.search(q_emb, k)
+    return [chunk_store.get_many(row[:top_k]) for row, (_, top_k) in zip(I, requests)]
 
-d = doc_embeddings.shape[1]
-index = faiss.IndexFlatIP(d)
-index.add(doc_embeddings)
+# Concurrent callers are coalesced into one batch; see query_batcher.py for RAG_BATCH_MAX_SIZE / RAG_BATCH_WAIT_MS
+query_batcher = MicroBatcher(search_batch, name="rag-batcher")
 
 def retrieve_chunks(query, top_k=TOP_K):
-    q_emb = embed_model.encode([query], convert_to_numpy=True)
-    faiss.normalize_L2(q_emb)
-    D, I = index.search(q_emb, top_k)
-    return [chunked_docs[i] for i in I[0] if i < len(chunked_docs)]
-
-print("Setup complete.")
+    return query_batcher((query, top_k))
 
 def preprocess(path: str):
     audio = AudioSegment.from_file(path)
    
     audio = audio.set_channels(1).set_frame_rate(16000)
    
-    audio = high_pass_filter(audio, cutoff=100)     
-    audio = low_pass_filter(audio, cutoff=8000)     
-   
-    audio = effects.normalize(audio)
-    audio = compress_dynamic_range(audio, threshold=-20.0, ratio=4.0, attack=5, release=50)
-    return audio
+    # band-limit, normalize and compress on NumPy arrays (see audio_preprocess.py)
+    x, sr = segment_to_pcm(audio)
+    return pcm_to_segment(preprocess_pcm(x, sr), sr)
 
 def split_chunks(audio: AudioSegment, chunk_sec=CHUNK_SEC):
-    step = int(chunk_sec * 1000)
-    return [audio[i:i+step] for i in range(0, len(audio), step)]
+    # silence dropped, cuts at pauses, regions packed up to chunk_sec per request (see vad.py)
+    x, sr = segment_to_pcm(audio)
+    return [pcm_to_segment(part, sr) for part in segment_pcm(x, sr, max_sec=chunk_sec)]
 
 def speech_to_text(path: str):
-    r = sr.Recognizer()
     audio = preprocess(path)
     chunks = split_chunks(audio)
-
-    texts = []
-    with tempfile.TemporaryDirectory() as td:
-        for i, ch in enumerate(chunks, 1):
-            wav_path = os.path.join(td, f"part_{i}.wav")
-            ch.export(wav_path, format="wav")
-            with sr.AudioFile(wav_path) as source:
-              
-                r.adjust_for_ambient_noise(source, duration=0.3)
-                audio_chunk = r.record(source)
-
-            try:
-                
-                result = r.recognize_google(audio_chunk, language=LANG, show_all=True)
-                if isinstance(result, dict) and "alternative" in result and result["alternative"]:
-                    best = max(result["alternative"], key=lambda a: a.get("confidence", 0))
-                    texts.append(best.get("transcript", "").strip())
-                else:
-                  
-                    txt = r.recognize_google(audio_chunk, language=LANG)
-                    texts.append(txt.strip())
-                print(f"[{i}/{len(chunks)}] ✓")
-            except sr.UnknownValueError:
-                print(f"[{i}/{len(chunks)}] (no speech recognized)")
-            except sr.RequestError as e:
-                raise SystemExit(f"[{i}/{len(chunks)}] API error: {e}")
+    # Chunks go to the ASR_BACKEND engine (google / local / stub) concurrently and come back in order
+    texts = recognize_chunks(chunks, language=LANG)
     return " ".join(t for t in texts if t).strip()
 
 
@@ -166,6 +243,8 @@ def respond(msg, user_id):
                  "You can also contact a local crisis line or reach out to someone you trust.")
         return {"response": {"reply": reply}}
 
+    model = components.require("llm")
+
     # Retrieve relevant chunks
     relevant_chunks = retrieve_chunks(msg)
     context_text = "\n".join(relevant_chunks) if relevant_chunks else "No relevant content found in the document."
@@ -223,104 +302,187 @@ def respond(msg, user_id):
     return {"final_response": answer}
 
 
+class UploadTooLarge(Exception):
+    pass
+
+async def save_upload(request: Request, field: str = "file", max_bytes: int = VIDEO_MAX_UPLOAD_BYTES) -> str:
+    """
+    Stream the multipart file field `field` of the request body straight into
+    a temp file and return its path. FastAPI is given no File() parameter, so the
+    body is not spooled first: an oversized upload is refused from Content-Length
+    before anything is read (or as soon as the limit is crossed, for chunked
+    bodies), and the data is written to disk exactly once.
+    """
+    length = request.headers.get("content-length", "")
+    if length.isdigit() and int(length) > max_bytes:
+        raise UploadTooLarge(f"Upload exceeds {max_bytes // (1024 * 1024)} MB limit")
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise ValueError("Expected a multipart/form-data upload")
+
+    part = {"field": b"", "value": b"", "headers": {}, "target": False}
+    out = {"tmp": None}
+    pending = []  # bytes of the file field parsed from the latest network chunk
+
+    def on_part_begin():
+        part["headers"], part["target"] = {}, False
+
+    def on_header_field(data, start, end):
+        part["field"] += data[start:end]
+
+    def on_header_value(data, start, end):
+        part["value"] += data[start:end]
+
+    def on_header_end():
+        part["headers"][part["field"].lower()] = part["value"]
+        part["field"], part["value"] = b"", b""
+
+    def on_headers_finished():
+        _, disposition = parse_options_header(part["headers"].get(b"content-disposition", b""))
+        if disposition.get(b"name") == field.encode() and out["tmp"] is None:
+            filename = disposition.get(b"filename", b"").decode("utf-8", "replace")
+            out["tmp"] = tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(filename)[1])
+            part["target"] = True
+
+    def on_part_data(data, start, end):
+        if part["target"]:
+            pending.append(data[start:end])
+
+    def on_part_end():
+        part["target"] = False
+
+    parser = MultipartParser(boundary, {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+    })
+    total = 0
+    try:
+        async for chunk in request.stream():
+            total += len(chunk)
+            if total > max_bytes:
+                raise UploadTooLarge(f"Upload exceeds {max_bytes // (1024 * 1024)} MB limit")
+            parser.write(chunk)
+            if pending:
+                data = b"".join(pending)
+                pending.clear()
+                await run_in_threadpool(out["tmp"].write, data)
+        parser.finalize()
+        if out["tmp"] is None:
+            raise ValueError(f"Missing '{field}' file field")
+        out["tmp"].close()
+    except BaseException:
+        if out["tmp"] is not None:
+            out["tmp"].close()
+            os.remove(out["tmp"].name)
+        raise
+    return out["tmp"].name
+
 @app.post("/detect_video_emotions")
-async def detect_video_emotions(user_id, file: UploadFile = File(...)):
+async def detect_video_emotions(user_id, request: Request):
+    # The "file" multipart field is streamed to disk by save_upload rather than declared as
+    # File(...), which would make FastAPI spool the whole body before this handler runs
+    _, model = await run_in_threadpool(components.require, FACE_COMPONENT, "llm")
     try:
-        # Save uploaded file temporarily
-        suffix = os.path.splitext(file.filename)[1]
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-            tmp.write(await file.read())
-            tmp_path = tmp.name
+        try:
+            tmp_path = await save_upload(request, "file")
+        except UploadTooLarge as e:
+            return JSONResponse({"error": str(e)}, status_code=413)
 
-        cap = cv2.VideoCapture(tmp_path)
-        if not cap.isOpened():
-            return JSONResponse({"error": "Cannot open video file"}, status_code=400)
+        # Frames are sampled to VIDEO_TARGET_FPS and near-duplicates skipped, and decoding
+        # overlaps inference on a separate thread; see video_emotion.py
+        try:
+            emotions, frame_stats = await analysis_pool.run(video_task, tmp_path)
+        finally:
+            os.remove(tmp_path)
 
-        emotions = []
-        frame_count = 0
+        # GCS, transcription and Gemini calls all block, so keep them off the event loop
+        return await run_in_threadpool(video_response, user_id, emotions, frame_stats, model)
 
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            emotion = detector.detect_emotion(frame)
-            emotions.append(emotion)
-            frame_count += 1
+    except AnalysisPoolBusy as e:
+        return JSONResponse({"error": str(e)}, status_code=503, headers={"Retry-After": "10"})
+    except AnalysisTimeout as e:
+        return JSONResponse({"error": str(e)}, status_code=504)
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
 
-        cap.release()
-        os.remove(tmp_path)
+def video_response(user_id, emotions, frame_stats, model):
+    frame_count = len(emotions)
 
-      
-        final_emotion = Counter(emotions).most_common(1)[0][0] if emotions else "No face detected"
+    final_emotion = Counter(emotions).most_common(1)[0][0] if emotions else "No face detected"
 
-        try:
-            # Try to get tone analysis
-            analysis, download_ms, file_count, total_bytes = speech_processor.process_gcs_frames(
-                bucket_name=default_bucket,
-                prefix=f"users/{user_id}/"  # Use consistent path
-            )
-        except Exception as e:
-            print(f"Tone analysis error: {e}")
-            analysis = "No audio analysis available"
+    try:
+        # Try to get tone analysis
+        components.require(SPEECH_COMPONENT)
+        analysis, download_ms, file_count, total_bytes = analysis_pool.run_sync(
+            tone_task, default_bucket, f"users/{user_id}/"  # Use consistent path
+        )
+    except Exception as e:
+        print(f"Tone analysis error: {e}")
+        analysis = "No audio analysis available"
 
+    try:
+        # Try to get transcript
+        transcript = transcribe_latest_concat(default_bucket, user_id, k=3, pool=30)
+    except Exception as e:
+        print(f"Transcript error: {e}")
+        transcript = ""
+    
+    context_text = "No relevant content found."
+    if transcript:
         try:
-            # Try to get transcript
-            transcript = transcribe_latest_concat(default_bucket, k=3, pool=30)
-        except Exception as e:
-            print(f"Transcript error: {e}")
-            transcript = ""
-        
-        context_text = "No relevant content found."
-        if transcript:
-            try:
-                relevant_chunks = retrieve_chunks(transcript)
-                context_text = "\n".join(relevant_chunks) if relevant_chunks else context_text
-            except Exception as e:
-                print(f"RAG error: {e}")
-           
-      
-        try:
-            questionnaire = fetch_all_from_mongo("users", {"user_id": user_id})
+            relevant_chunks = retrieve_chunks(transcript)
+            context_text = "\n".join(relevant_chunks) if relevant_chunks else context_text
         except Exception as e:
-            questionnaire = ""
-
-        prompt = f"""
-        Using the following DSM-5 context, answer the user's question:
+            print(f"RAG error: {e}")
+       
+  
+    try:
+        questionnaire = fetch_all_from_mongo("users", {"user_id": user_id})
+    except Exception as e:
+        questionnaire = ""
 
-        {context_text}
+    prompt = f"""
+    Using the following DSM-5 context, answer the user's question:
 
-        User question: "{transcript}"
-        User tone analysis: "{analysis}"
-        User final detected emotion: "{final_emotion}"
-        User's previous questionnaire data: "{questionnaire}"
-        Respond in a concise, empathetic, and supportive way. Focus on genuinely understanding the person's feelings and providing comforting, actionable guidance. Understand the user's tone and emotion while responding. Do NOT provide medical advice or suggest contacting health professionals.
+    {context_text}
 
-        """
-        response = model.generate_content(prompt)
-        answer = (response.text or "").strip()
-        print(f"Final Video Response for {user_id}: {answer}")
-        return JSONResponse({
-            "emotions_per_frame": emotions,
-            "total_frames": frame_count,
-            "final_emotion": final_emotion,
-            "final_response": answer,
-        })
+    User question: "{transcript}"
+    User tone analysis: "{analysis}"
+    User final detected emotion: "{final_emotion}"
+    User's previous questionnaire data: "{questionnaire}"
+    Respond in a concise, empathetic, and supportive way. Focus on genuinely understanding the person's feelings and providing comforting, actionable guidance. Understand the user's tone and emotion while responding. Do NOT provide medical advice or suggest contacting health professionals.
 
-    except Exception as e:
-        return JSONResponse({"error": str(e)}, status_code=400)
+    """
+    response = model.generate_content(prompt)
+    answer = (response.text or "").strip()
+    print(f"Final Video Response for {user_id}: {answer}")
+    return JSONResponse({
+        "emotions_per_frame": emotions,
+        "total_frames": frame_count,
+        "analyzed_frames": frame_stats["analyzed"],
+        "final_emotion": final_emotion,
+        "final_response": answer,
+    })
 
 @app.get("/process_speech")
 def process_speech(userid):
     """
     Process all audio frames in GCS under a prefix matching the user ID.
     """
+    model = components.require("llm")
     try:
         # Use consistent prefix
         prefix = f"users/{userid}/"
         try:
-            analysis, download_ms, file_count, total_bytes = speech_processor.process_gcs_frames(
-                bucket_name=default_bucket,
-                prefix=prefix
+            components.require(SPEECH_COMPONENT)
+            analysis, download_ms, file_count, total_bytes = analysis_pool.run_sync(
+                tone_task, default_bucket, prefix
             )
         except Exception as e:
             print(f"Tone analysis error: {e}")
@@ -329,7 +491,7 @@ def process_speech(userid):
         
         transcript = ""
         try:
-            transcript = transcribe_latest_concat(default_bucket, k=3, pool=30)
+            transcript = transcribe_latest_concat(default_bucket, userid, k=3, pool=30)
         except Exception as e:
             print(f"Voice transcript error: {e}")
 
@@ -0,0 +1,129 @@
+"""
+Process-wide registry of loaded models.
+
+Every model (wav2vec emotion classifier, sentence embedder, DeepFace emotion
+detector, ...) is loaded at most once per process, on first use, and shared by
+every caller after that. Loads are serialized per name, so concurrent requests
+that need the same model wait for a single from_pretrained instead of each
+starting their own. stats() reports how long each load took and roughly how
+much memory it added (RSS growth during the load, plus parameter bytes for
+torch modules).
+
+    from model_registry import registry
+    feature_extractor, model = registry.get("wav2vec-emotion", load_fn)
+"""
+import os
+import threading
+import time
+
+
+def _rss_bytes() -> int | None:
+    """Current resident set size of this process, or None where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _param_bytes(value) -> int:
+    """Bytes held by torch parameters/buffers in `value` (a module, a tuple of them, or an object holding one)."""
+    if isinstance(value, (tuple, list)):
+        return sum(_param_bytes(v) for v in value)
+    if hasattr(value, "parameters") and hasattr(value, "buffers"):
+        try:
+            tensors = list(value.parameters()) + list(value.buffers())
+            return sum(t.numel() * t.element_size() for t in tensors)
+        except Exception:
+            return 0
+    inner = getattr(value, "model", None)
+    return _param_bytes(inner) if inner is not None and inner is not value else 0
+
+
+class ModelEntry:
+    def __init__(self, name: str, loader=None):
+        self.name = name
+        self.loader = loader
+        self.value = None
+        self.loaded = False
+        self.load_seconds: float | None = None
+        self.rss_delta_bytes: int | None = None
+        self.param_bytes = 0
+        self.hits = 0
+        self.lock = threading.Lock()
+
+    def describe(self) -> dict:
+        out = {"loaded": self.loaded, "hits": self.hits}
+        if self.load_seconds is not None:
+            out["load_seconds"] = round(self.load_seconds, 3)
+        if self.rss_delta_bytes is not None:
+            out["rss_delta_mb"] = round(self.rss_delta_bytes / 2**20, 1)
+        if self.param_bytes:
+            out["param_mb"] = round(self.param_bytes / 2**20, 1)
+        return out
+
+
+class ModelRegistry:
+    def __init__(self):
+        self._entries: dict[str, ModelEntry] = {}
+        self._lock = threading.Lock()
+
+    def _entry(self, name: str) -> ModelEntry:
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                entry = self._entries[name] = ModelEntry(name)
+            return entry
+
+    def register(self, name: str, loader) -> None:
+        """Set the loader used the first time `name` is requested (does not load it)."""
+        entry = self._entry(name)
+        with entry.lock:
+            entry.loader = loader
+
+    def put(self, name: str, value) -> None:
+        """Register a model that was loaded elsewhere."""
+        entry = self._entry(name)
+        with entry.lock:
+            entry.value = value
+            entry.loaded = True
+            entry.param_bytes = _param_bytes(value)
+
+    def get(self, name: str, loader=None):
+        """Return the model called `name`, loading it (once) with `loader` or the registered loader."""
+        entry = self._entry(name)
+        if not entry.loaded:
+            with entry.lock:
+                if not entry.loaded:
+                    load = loader or entry.loader
+                    if load is None:
+                        raise KeyError(f"No loader registered for model '{name}'")
+                    rss0 = _rss_bytes()
+                    t0 = time.time()
+                    value = load()
+                    entry.load_seconds = time.time() - t0
+                    rss1 = _rss_bytes()
+                    if rss0 is not None and rss1 is not None:
+                        entry.rss_delta_bytes = rss1 - rss0
+                    entry.param_bytes = _param_bytes(value)
+                    entry.value = value
+                    entry.loaded = True
+                    print(f"Loaded model '{name}' in {entry.load_seconds:.1f}s")
+                    return value
+        entry.hits += 1
+        return entry.value
+
+    def is_loaded(self, name: str) -> bool:
+        entry = self._entries.get(name)
+        return entry is not None and entry.loaded
+
+    def stats(self) -> dict:
+        rss = _rss_bytes()
+        return {
+            "rss_mb": round(rss / 2**20, 1) if rss is not None else None,
+            "models": {name: entry.describe() for name, entry in self._entries.items()},
+        }
+
+
+# The registry shared by everything in this process
+registry = ModelRegistry()
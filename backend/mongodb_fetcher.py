@@ -31,3 +31,28 @@ def fetch_all_from_mongo(collection_name: str, query: dict = None, limit: int =
         if "_id" in doc:
             doc["_id"] = str(doc["_id"])
     return results
+
+
+def fetch_latest_from_mongo(collection_name: str, query: dict, sort_field: str, limit: int, projection: dict = None):
+    """
+    Fetch the `limit` newest documents matching `query`, newest first by `sort_field`.
+    With an index on the query fields + sort_field this reads O(limit) documents.
+    """
+    cursor = db[collection_name].find(query or {}, projection).sort(sort_field, -1).limit(limit)
+    results = list(cursor)
+    for doc in results:
+        if "_id" in doc:
+            doc["_id"] = str(doc["_id"])
+    return results
+
+
+_ensured_indexes = set()
+
+
+def ensure_index(collection_name: str, keys: list):
+    """Create a (compound) index once per process; keys is [(field, direction), ...]."""
+    ident = (collection_name, tuple(keys))
+    if ident in _ensured_indexes:
+        return
+    db[collection_name].create_index(keys)
+    _ensured_indexes.add(ident)
@@ -0,0 +1,143 @@
+"""
+On-disk cache of decoded audio, shared by the tone and transcript pipelines.
+
+Each GCS object is decoded once to 16 kHz mono float32 PCM and saved as an
+.npy file named after (bucket, key, generation); later reads memory-map it
+instead of downloading and running ffmpeg again. Because the cache lives on
+disk, analysis worker processes and the API process share it. Files are
+evicted least-recently-used first (a hit refreshes the file's mtime) once the
+directory grows past PCM_CACHE_MAX_MB.
+
+    PCM_CACHE_DIR      cache directory (default backend/.cache/pcm)
+    PCM_CACHE_MAX_MB   byte budget in MB (default 1024, 0 disables the cache)
+"""
+import hashlib
+import os
+import threading
+
+import numpy as np
+
+DEFAULT_DIR = os.path.join(os.path.dirname(__file__), ".cache", "pcm")
+
+
+class PCMCache:
+    def __init__(self, directory: str | None = None, max_bytes: int | None = None):
+        self.directory = directory or os.getenv("PCM_CACHE_DIR", DEFAULT_DIR)
+        if max_bytes is None:
+            max_bytes = int(float(os.getenv("PCM_CACHE_MAX_MB", "1024")) * 1024 * 1024)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._bytes = 0
+        if self.enabled:
+            os.makedirs(self.directory, exist_ok=True)
+            self._bytes = sum(size for _, size, _ in self._entries())
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _path(self, bucket: str, key: str, generation) -> str:
+        digest = hashlib.sha1(f"{bucket}/{key}#{generation or 0}".encode()).hexdigest()
+        return os.path.join(self.directory, digest + ".npy")
+
+    def _entries(self):
+        """(path, size, mtime) for every cached file."""
+        out = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".npy"):
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue
+                out.append((entry.path, st.st_size, st.st_mtime))
+        return out
+
+    def get(self, bucket: str, key: str, generation) -> np.ndarray | None:
+        """Memory-mapped PCM for the object, or None if it is not cached."""
+        if not self.enabled:
+            return None
+        path = self._path(bucket, key, generation)
+        try:
+            pcm = np.load(path, mmap_mode="r")
+            os.utime(path)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return pcm
+
+    def put(self, bucket: str, key: str, generation, pcm: np.ndarray) -> None:
+        if not self.enabled:
+            return
+        pcm = np.ascontiguousarray(pcm, dtype=np.float32)
+        if pcm.nbytes > self.max_bytes:
+            return
+        path = self._path(bucket, key, generation)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            np.save(f, pcm)
+        with self._lock:
+            # an overwritten entry replaces its old file, so only the size difference counts
+            try:
+                old_size = os.path.getsize(path)
+            except FileNotFoundError:
+                old_size = 0
+            os.replace(tmp, path)
+            self._bytes += os.path.getsize(path) - old_size
+            if self._bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        # Rescan: other processes share the directory, so the running total is only an estimate
+        entries = sorted(self._entries(), key=lambda e: e[2])
+        total = sum(size for _, size, _ in entries)
+        target = int(self.max_bytes * 0.9)
+        for path, size, _ in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            self.evictions += 1
+        self._bytes = total
+
+    def get_or_decode(self, bucket: str, key: str, generation, decode) -> np.ndarray:
+        """Cached PCM for the object, or decode() it (download + decode) and cache the result."""
+        pcm = self.get(bucket, key, generation)
+        if pcm is None:
+            pcm = decode()
+            self.put(bucket, key, generation, pcm)
+        return pcm
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / total) if total else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def pcm_cache() -> PCMCache:
+    """The process-wide cache (created on first use)."""
+    global _default
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                _default = PCMCache()
+    return _default
@@ -5,20 +5,61 @@ import math
 import numpy as np
 import os
 import io
-import tempfile
 import time
-from google.cloud import storage
 from collections import Counter
 import warnings
+import audio_preprocess
+from audio_io import fetch_pcm, gcs_client as shared_gcs_client, map_bounded
+from model_registry import registry
+from tone_cache import ToneCache
 
 warnings.filterwarnings('ignore')
 
+DEFAULT_MODEL = "r-f/wav2vec-english-speech-emotion-recognition"
+# Bump when normalize/trim, speech_mask, windowing or pooling change, so cached tone results are recomputed
+ANALYSIS_VERSION = 1
+
+def load_wav2vec(model_name: str = DEFAULT_MODEL):
+    """Return the shared (feature_extractor, model) pair, loading it once per process."""
+    def load():
+        feature_extractor = Wav2Vec2FeatureExtractor.from_pretrained(model_name)
+        model = Wav2Vec2ForSequenceClassification.from_pretrained(model_name)
+        model.eval()
+        return feature_extractor, model
+    return registry.get(f"wav2vec-emotion:{model_name}", load)
+
 class EnsembleEmotionRecognizer:
-    def __init__(self, model_name="r-f/wav2vec-english-speech-emotion-recognition", num_runs=5):
-        self.feature_extractor = Wav2Vec2FeatureExtractor.from_pretrained(model_name)
-        self.model = Wav2Vec2ForSequenceClassification.from_pretrained(model_name)
-        self.model.eval()
-        self.num_runs = num_runs
+    """
+    wav2vec2 emotion classifier with test-time augmentation.
+
+    The model is deterministic in eval mode, so repeating the same input gives
+    the same vote every time. Instead, each chunk is expanded into `num_runs`
+    views (the original, small time shifts of TONE_TTA_SHIFT_MS and speed
+    perturbations of +/- TONE_TTA_SPEED) that go through the model together in
+    one batched forward pass. num_runs=1 is single-pass mode. Gain changes are
+    not used: the feature extractor normalizes every input to zero mean and
+    unit variance, which would undo them.
+
+    With TONE_INFERENCE_MODE=shared, windows are not encoded one by one:
+    each run of overlapping speech windows (up to TONE_SEGMENT_SEC long) goes
+    through the wav2vec2 encoder once, and every window mean-pools the
+    projected hidden states over its own frame range before the classifier
+    head. Overlapping audio is then encoded once instead of twice, and finer
+    hops (TONE_HOP_SEC) cost only extra pooling. Shared mode is single-pass;
+    the TTA views are not used.
+    """
+
+    def __init__(self, model_name=DEFAULT_MODEL, num_runs=5):
+        # Weights come from the process-wide registry, so extra recognizers are cheap
+        self.feature_extractor, self.model = load_wav2vec(model_name)
+        self.model_name = model_name
+        self.num_runs = max(1, num_runs)
+        self.tta_shift_ms = float(os.getenv("TONE_TTA_SHIFT_MS", "50"))
+        self.tta_speed = float(os.getenv("TONE_TTA_SPEED", "0.05"))
+        self.batch_size = max(1, int(os.getenv("TONE_BATCH_SIZE", "16")))
+        self.inference_mode = os.getenv("TONE_INFERENCE_MODE", "windowed").lower()
+        self.segment_sec = float(os.getenv("TONE_SEGMENT_SEC", "30"))
+        self.hop_sec = min(max(float(os.getenv("TONE_HOP_SEC", "0.5")), 0.05), 1.0)
 
         # Confidence thresholds (unused in logic, kept for clarity)
         self.high_confidence_threshold = 0.7
@@ -65,68 +106,250 @@ class EnsembleEmotionRecognizer:
         except Exception:
             return None, 0.0
 
+    def warmup(self, seconds: float = 1.0, sr: int = 16000):
+        """Run one forward pass on low-level noise, bypassing the speech gate, to initialize the model."""
+        noise = (np.random.default_rng(0).standard_normal(int(seconds * sr)) * 0.01).astype(np.float32)
+        inputs = self.feature_extractor(noise, sampling_rate=sr, return_tensors="pt", padding=True)
+        with torch.no_grad():
+            self.model(**inputs)
+
+    def augment(self, audio_chunk: np.ndarray, sr: int) -> np.ndarray:
+        """Stack `num_runs` same-length views of the chunk: original, shifts, then speed changes."""
+        n = len(audio_chunk)
+        shift = max(1, int(self.tta_shift_ms * sr / 1000))
+        plan = [("shift", 0), ("shift", shift), ("shift", -shift),
+                ("speed", 1.0 + self.tta_speed), ("speed", 1.0 - self.tta_speed)]
+        k = 2
+        while len(plan) < self.num_runs:
+            plan += [("shift", k * shift), ("shift", -k * shift)]
+            k += 1
+
+        views = np.zeros((self.num_runs, n), dtype=np.float32)
+        for row, (kind, amount) in zip(views, plan):
+            if kind == "shift":
+                # delay (positive) or advance (negative) with zero fill, no wrap-around
+                if amount >= 0:
+                    row[amount:] = audio_chunk[:n - amount]
+                else:
+                    row[:amount] = audio_chunk[-amount:]
+            else:
+                # resample in time by `amount` (>1 = faster), then crop / zero-pad back to n
+                positions = np.arange(0, n - 1, amount)[:n]
+                row[:len(positions)] = np.interp(positions, np.arange(n), audio_chunk)
+        return views
+
+    def predict_batch(self, batch: np.ndarray, sr: int) -> np.ndarray:
+        """Class probabilities for a (batch, samples) array in one forward pass."""
+        inputs = self.feature_extractor(list(batch), sampling_rate=sr, return_tensors="pt", padding=True)
+        with torch.no_grad():
+            logits = self.model(**inputs).logits
+        return torch.softmax(logits, dim=-1).numpy()
+
+    def vote(self, probs: np.ndarray):
+        """Majority-vote emotion + ensemble confidence over the per-view probabilities of one chunk."""
+        ids = probs.argmax(axis=-1)
+        top = probs.max(axis=-1)
+        counts = Counter(ids.tolist())
+        final_id, vote_count = counts.most_common(1)[0]
+        vote_ratio = vote_count / len(ids)
+        ensemble_confidence = float(vote_ratio * np.mean(top[ids == final_id]))
+        return self.model.config.id2label[final_id], ensemble_confidence
+
     def predict_chunk_ensemble(self, audio_chunk: np.ndarray, sr: int):
-        """Run multiple predictions and return majority-vote emotion + ensemble confidence."""
-        predictions, confidences = [], []
-        for _ in range(self.num_runs):
-            emotion, conf = self.predict_single_chunk(audio_chunk, sr)
-            if emotion is not None:
-                predictions.append(emotion)
-                confidences.append(conf)
-        if not predictions:
+        """Return majority-vote emotion + ensemble confidence over the augmented views of a chunk."""
+        if not self.is_valid_speech(audio_chunk, sr):
             return None, 0.0
+        try:
+            probs = self.predict_batch(self.augment(audio_chunk, sr), sr)
+        except Exception:
+            return None, 0.0
+        return self.vote(probs)
 
-        counts = Counter(predictions)
-        final_emotion, vote_count = counts.most_common(1)[0]
-        vote_ratio = vote_count / len(predictions)
-        emo_conf = [c for e, c in zip(predictions, confidences) if e == final_emotion]
-        ensemble_confidence = float(vote_ratio * (np.mean(emo_conf) if emo_conf else 0.0))
-        return final_emotion, ensemble_confidence
-
-    def process_audio(self, audio_file: str):
-        """Process a single audio file path (any format librosa can decode)."""
-        sr_target = 16000
-        print(f"Running ensemble emotion recognition ({self.num_runs} runs per chunk)...")
-        y, sr = librosa.load(audio_file, sr=sr_target, mono=True)
-        y = librosa.util.normalize(y)
+    def predict_windows(self, windows: np.ndarray, sr: int, mask: np.ndarray | None = None) -> list:
+        """
+        (emotion, confidence) for each row of a (n_windows, samples) array, or
+        (None, 0.0) for rows that are not speech. `mask` is a precomputed
+        speech_mask; without it each window is gated with is_valid_speech.
+        Valid windows and their augmented views are scored batch_size windows
+        per forward pass.
+        """
+        out = [(None, 0.0)] * len(windows)
+        if mask is None:
+            valid = [i for i, w in enumerate(windows) if self.is_valid_speech(w, sr)]
+        else:
+            valid = np.flatnonzero(mask).tolist()
+        for b in range(0, len(valid), self.batch_size):
+            idx = valid[b:b + self.batch_size]
+            views = np.concatenate([self.augment(windows[i], sr) for i in idx])
+            try:
+                probs = self.predict_batch(views, sr).reshape(len(idx), self.num_runs, -1)
+            except Exception:
+                continue
+            for i, p in zip(idx, probs):
+                out[i] = self.vote(p)
+        return out
+
+    def encode_frames(self, segment: np.ndarray, sr: int):
+        """Projected wav2vec2 hidden states (frames, proj_dim) for one segment, i.e. the classifier's input before pooling."""
+        inputs = self.feature_extractor(segment, sampling_rate=sr, return_tensors="pt")
+        model = self.model
+        with torch.no_grad():
+            out = model.wav2vec2(inputs["input_values"], output_hidden_states=model.config.use_weighted_layer_sum)
+            if model.config.use_weighted_layer_sum:
+                hidden = torch.stack(out.hidden_states, dim=1)
+                weights = torch.softmax(model.layer_weights, dim=-1).view(-1, 1, 1)
+                hidden = (hidden * weights).sum(dim=1)
+            else:
+                hidden = out[0]
+            return model.projector(hidden)[0]
+
+    def predict_windows_shared(self, y: np.ndarray, starts: np.ndarray, chunk_size: int, sr: int,
+                               mask: np.ndarray) -> list:
+        """
+        Same output as predict_windows, but encodes each run of overlapping
+        speech windows once and pools per window (TONE_INFERENCE_MODE=shared).
+        """
+        out = [(None, 0.0)] * len(starts)
+        valid = np.flatnonzero(mask).tolist()
+        if not valid:
+            return out
+        samples_per_frame = int(np.prod(self.model.config.conv_stride))
+        window_frames = int(self.model._get_feat_extract_output_lengths(chunk_size))
+        max_span = max(chunk_size, int(self.segment_sec * sr))
+        y = np.pad(y, (0, max(0, int(starts[-1]) + chunk_size - len(y))))
+
+        # Group valid windows into segments: a new one starts at a gap or when the span gets too long
+        segments, current = [], [valid[0]]
+        for i in valid[1:]:
+            if starts[i] >= starts[current[-1]] + chunk_size or starts[i] + chunk_size - starts[current[0]] > max_span:
+                segments.append(current)
+                current = []
+            current.append(i)
+        segments.append(current)
+
+        for idx in segments:
+            seg_start = int(starts[idx[0]])
+            try:
+                frames = self.encode_frames(y[seg_start:int(starts[idx[-1]]) + chunk_size], sr)
+                with torch.no_grad():
+                    pooled = []
+                    for i in idx:
+                        first = (int(starts[i]) - seg_start) // samples_per_frame
+                        pooled.append(frames[first:first + window_frames].mean(dim=0))
+                    logits = self.model.classifier(torch.stack(pooled))
+                probs = torch.softmax(logits, dim=-1).numpy()
+            except Exception:
+                continue
+            for i, p in zip(idx, probs):
+                out[i] = self.vote(p[None, :])
+        return out
+
+    def config_key(self) -> str:
+        """Identifies everything that affects window results (used to key cached results)."""
+        return (f"v{ANALYSIS_VERSION}|{self.model_name}|runs={self.num_runs}|mode={self.inference_mode}"
+                f"|hop={self.hop_sec:g}|shift={self.tta_shift_ms:g}|speed={self.tta_speed:g}"
+                f"|segment={self.segment_sec:g}")
+
+    def analyze_waveform(self, y: np.ndarray, sr: int) -> list[dict]:
+        """Normalize and trim a waveform, then classify its 1s windows (TONE_HOP_SEC apart) in batches."""
+        return self.analyze_segment(y, sr)[0]
+
+    def analyze_segment(self, y: np.ndarray, sr: int):
+        """analyze_waveform, also returning the trimmed duration in seconds (the span the results cover)."""
+        y = audio_preprocess.normalize(y, headroom=0.0)
         y, _ = librosa.effects.trim(y, top_db=20)
-
-        total_duration = len(y) / sr_target
-        print(f"Processing audio: {total_duration:.2f} seconds")
-
-        # Chunking
-        chunk_dur = 1.0
-        overlap_dur = 0.5
-        chunk_size = int(chunk_dur * sr_target)
-        overlap_size = int(overlap_dur * sr_target)
-        step = chunk_size - overlap_size
-
+        starts, ends, windows = sliding_windows(y, sr, overlap_dur=1.0 - self.hop_sec)
+        mask = speech_mask(y, starts, windows.shape[1], sr)
+        if self.inference_mode == "shared":
+            predictions = self.predict_windows_shared(y, starts, windows.shape[1], sr, mask)
+        else:
+            predictions = self.predict_windows(windows, sr, mask)
         results = []
-        if len(y) < chunk_size // 3:
-            return results
-
-        num_chunks = max(0, math.ceil((len(y) - chunk_size) / step) + 1)
-        for i in range(num_chunks):
-            start = i * step
-            end = min(start + chunk_size, len(y))
-            if end - start < chunk_size // 3:
-                break
-            chunk = y[start:end]
-            if len(chunk) < chunk_size:
-                chunk = np.pad(chunk, (0, chunk_size - len(chunk)), mode='constant')
-            emotion, conf = self.predict_chunk_ensemble(chunk, sr_target)
+        for start, end, (emotion, conf) in zip(starts, ends, predictions):
             if emotion is None:
                 continue
             results.append({
                 "emotion": emotion,
                 "confidence": float(conf),
-                "start": start / sr_target,
-                "end": min(end / sr_target, total_duration),
+                "start": start / sr,
+                "end": end / sr,
             })
+        return results, len(y) / sr
 
+    def process_audio(self, audio_file: str):
+        """Process a single audio file path (any format librosa can decode)."""
+        sr_target = 16000
+        print(f"Running ensemble emotion recognition ({self.num_runs} views per chunk)...")
+        y, sr = librosa.load(audio_file, sr=sr_target, mono=True)
+        print(f"Processing audio: {len(y) / sr_target:.2f} seconds")
+        results = self.analyze_waveform(y, sr_target)
         print("Ensemble processing complete!")
         return results
 
+def sliding_windows(y: np.ndarray, sr: int, chunk_dur=1.0, overlap_dur=0.5):
+    """
+    Return (starts, ends, windows) for the overlapping analysis windows of `y`.
+    windows is a strided (n, chunk_size) view over `y` (zero-padded at the end
+    so the last window is full length); ends are clipped to len(y). Windows
+    shorter than a third of chunk_size are dropped.
+    """
+    chunk_size, overlap_size = int(chunk_dur * sr), int(round(overlap_dur * sr))
+    step = chunk_size - overlap_size
+    if len(y) < chunk_size // 3:
+        return np.zeros(0, dtype=int), np.zeros(0, dtype=int), np.zeros((0, chunk_size), dtype=np.float32)
+
+    num_chunks = max(0, math.ceil((len(y) - chunk_size) / step) + 1)
+    starts = np.arange(num_chunks) * step
+    ends = np.minimum(starts + chunk_size, len(y))
+    keep = ends - starts >= chunk_size // 3
+    starts, ends = starts[keep], ends[keep]
+    if len(starts) == 0:
+        return starts, ends, np.zeros((0, chunk_size), dtype=np.float32)
+
+    padded = np.pad(y, (0, max(0, int(starts[-1]) + chunk_size - len(y))))
+    windows = np.lib.stride_tricks.sliding_window_view(padded, chunk_size)[::step][:len(starts)]
+    return starts, ends, windows
+
+def _window_means(values: np.ndarray, first: np.ndarray, last: np.ndarray) -> np.ndarray:
+    """Mean of values[first[i]:last[i]] for every i, via one cumulative sum."""
+    csum = np.concatenate([[0.0], np.cumsum(values, dtype=np.float64)])
+    last = np.minimum(last, len(values))
+    counts = np.maximum(last - first, 1)
+    return (csum[last] - csum[first]) / counts
+
+def speech_mask(y: np.ndarray, starts: np.ndarray, chunk_size: int, sr: int) -> np.ndarray:
+    """
+    Vectorized is_valid_speech for every window starting at `starts`: RMS,
+    zero-crossing rate and spectral centroid are computed once over the whole
+    waveform, then averaged per window. Window RMS is exact; ZCR and centroid
+    use frames on a hop that divides the window step, so each window averages
+    the frames centred inside it rather than re-framing the chunk.
+    """
+    if len(starts) == 0:
+        return np.zeros(0, dtype=bool)
+    y = np.pad(y, (0, max(0, int(starts[-1]) + chunk_size - len(y))))
+    ends = starts + chunk_size
+    mask = np.sqrt(_window_means(y.astype(np.float64) ** 2, starts, ends)) >= 0.005
+
+    step = int(starts[1] - starts[0]) if len(starts) > 1 else chunk_size
+    hop = max(d for d in range(1, 513) if step % d == 0 and chunk_size % d == 0)
+    first, last = starts // hop, ends // hop + 1
+
+    try:
+        zcr = librosa.feature.zero_crossing_rate(y, frame_length=2048, hop_length=hop)[0]
+        mask &= ~(_window_means(zcr, first, last) > 0.4)
+    except Exception:
+        pass
+
+    try:
+        centroid = librosa.feature.spectral_centroid(y=y, sr=sr, n_fft=2048, hop_length=hop)[0]
+        centroid = _window_means(centroid, first, last)
+        mask &= ~((centroid < 300) | (centroid > 8000))
+    except Exception:
+        pass
+
+    return mask
+
 def _summarize_results_to_dict(results: list[dict]) -> dict | None:
     if not results:
         return None
@@ -162,39 +385,12 @@ def _summarize_results_to_dict(results: list[dict]) -> dict | None:
         "avg_confidence": float(np.mean(all_conf)) if all_conf else 0.0,
     }
 
-def analyze_audio_array(waveform: np.ndarray, rate: int, num_runs=5) -> dict | None:
-    rec = EnsembleEmotionRecognizer(num_runs=num_runs)
-    y = librosa.util.normalize(waveform.astype(np.float32, copy=False))
-    y, _ = librosa.effects.trim(y, top_db=20)
-
-    sr_target = rate
-    chunk_dur, overlap_dur = 1.0, 0.5
-    chunk_size, overlap_size = int(chunk_dur * sr_target), int(overlap_dur * sr_target)
-    step = chunk_size - overlap_size
-
-    if len(y) < chunk_size // 3:
-        return None
-
-    results = []
-    num_chunks = max(0, math.ceil((len(y) - chunk_size) / step) + 1)
-    for i in range(num_chunks):
-        start = i * step
-        end = min(start + chunk_size, len(y))
-        if end - start < chunk_size // 3:
-            break
-        chunk = y[start:end]
-        if len(chunk) < chunk_size:
-            chunk = np.pad(chunk, (0, chunk_size - len(chunk)), mode='constant')
-
-        emotion, conf = rec.predict_chunk_ensemble(chunk, sr_target)
-        if emotion is None:
-            continue
-        results.append({"emotion": emotion, "confidence": float(conf), "start": start / sr_target, "end": end / sr_target})
-
-    return _summarize_results_to_dict(results)
+def analyze_audio_array(waveform: np.ndarray, rate: int, num_runs=5, recognizer=None) -> dict | None:
+    rec = recognizer or EnsembleEmotionRecognizer(num_runs=num_runs)
+    return _summarize_results_to_dict(rec.analyze_waveform(waveform, rate))
 
-def analyze_audio_ensemble(audio_file: str, num_runs=5) -> dict | None:
-    rec = EnsembleEmotionRecognizer(num_runs=num_runs)
+def analyze_audio_ensemble(audio_file: str, num_runs=5, recognizer=None) -> dict | None:
+    rec = recognizer or EnsembleEmotionRecognizer(num_runs=num_runs)
     results = rec.process_audio(audio_file)
     return _summarize_results_to_dict(results)
 
@@ -206,53 +402,50 @@ class SpeechProcessor:
     def __init__(self, **options):
         self.options = options
         self.recognizer = EnsembleEmotionRecognizer(
-            num_runs=options.get("num_runs", 3)
+            num_runs=options.get("num_runs", int(os.getenv("TONE_ENSEMBLE_RUNS", "3")))
         )
+        self.tone_cache = options.get("tone_cache") or ToneCache()
+
+    def warmup(self):
+        self.recognizer.warmup()
 
     def process_file(self, path: str):
-        return analyze_audio_ensemble(path, num_runs=self.recognizer.num_runs)
+        return analyze_audio_ensemble(path, recognizer=self.recognizer)
 
     def process_gcs(self, bucket_name: str, key: str, gcs_client=None):
         """
-        Download a single GCS object to a temp file (preserving suffix),
-        analyze, and return (analysis_dict, download_ms).
+        Download a single GCS object into memory (or read it from the PCM
+        cache), decode and analyze it, and return (analysis_dict, download_ms).
         """
-        client = gcs_client or storage.Client()
-        bucket = client.bucket(bucket_name)
-        blob = bucket.blob(key)
-        
-        suffix = (os.path.splitext(key)[1] or ".wav").lower()
+        client = gcs_client or shared_gcs_client()
+        blob = client.bucket(bucket_name).get_blob(key)
+        if blob is None:
+            raise FileNotFoundError(f"gs://{bucket_name}/{key} not found")
+
         t0 = time.time()
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-            blob.download_to_filename(tmp.name)
-            tmp_path = tmp.name
+        y = fetch_pcm(bucket_name, key, blob.generation, blob=blob)
         download_ms = int((time.time() - t0) * 1000)
 
-        try:
-            analysis = analyze_audio_ensemble(tmp_path, num_runs=self.recognizer.num_runs)
-            if analysis is None:
-                analysis = {"phases": [], "distribution": {}, "total_duration": 0.0, "avg_confidence": 0.0}
-            return analysis, download_ms
-        finally:
-            try:
-                os.remove(tmp_path)
-            except OSError:
-                pass
+        analysis = _summarize_results_to_dict(self.recognizer.analyze_waveform(y, 16000))
+        if analysis is None:
+            analysis = {"phases": [], "distribution": {}, "total_duration": 0.0, "avg_confidence": 0.0}
+        return analysis, download_ms
 
     def process_gcs_frames(self, bucket_name: str, prefix: str, gcs_client=None):
         """
-        List all audio objects under gs://bucket/prefix, download each to a temp file,
-        decode with librosa (FFmpeg-backed; supports .webm), resample to 16k mono,
-        concatenate, and analyze once.
+        Tone analysis of all audio objects under gs://bucket/prefix, in name order.
+        Window results are cached per blob (name + generation, see tone_cache.py),
+        so only new or overwritten blobs are downloaded (in parallel, into
+        memory), decoded with ffmpeg (supports .webm) at 16k mono and analyzed;
+        cached windows are shifted onto one timeline and summarized together.
         Returns (analysis_dict, download_ms, file_count, total_bytes)
         """
-        client = gcs_client or storage.Client()
+        client = gcs_client or shared_gcs_client()
         bucket = client.bucket(bucket_name)
         allowed_exts = {".wav", ".mp3", ".flac", ".m4a", ".webm"}
 
         blobs = client.list_blobs(bucket, prefix=prefix)
-        keys, total_bytes = [], 0
-        t0 = time.time()
+        total_bytes = 0
         
         found_blobs = []
         for blob in blobs:
@@ -271,26 +464,31 @@ class SpeechProcessor:
         # Sort by updated time or name? Original S3 keys.sort() sorted by name.
         found_blobs.sort(key=lambda x: x.name)
 
-        # Download & decode each; use librosa.load for .webm (requires ffmpeg)
-        waveforms = []
-        for blob in found_blobs:
-            suffix = (os.path.splitext(blob.name)[1] or ".wav").lower()
-            with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmpf:
-                blob.download_to_filename(tmpf.name)
-                tmp_path = tmpf.name
-            try:
-                y, sr = librosa.load(tmp_path, sr=16000, mono=True)
-                waveforms.append(y.astype(np.float32, copy=False))
-            finally:
-                try:
-                    os.remove(tmp_path)
-                except OSError:
-                    pass
-
-        combined = np.concatenate(waveforms) if len(waveforms) > 1 else waveforms[0]
+        config = self.recognizer.config_key()
+        per_blob = self.tone_cache.get_many(bucket_name, [(b.name, b.generation) for b in found_blobs], config)
+        new_blobs = [b for b in found_blobs if b.name not in per_blob]
+
+        # Download & decode only what the result cache has not seen (decoded PCM may already be on
+        # disk from the transcript pipeline), fanned out over GCS_DOWNLOAD_WORKERS threads
+        t0 = time.time()
+        decoded = map_bounded(lambda b: fetch_pcm(bucket_name, b.name, b.generation, blob=b), new_blobs)
         download_ms = int((time.time() - t0) * 1000)
+        for blob, y in zip(new_blobs, decoded):
+            if isinstance(y, Exception):
+                raise y
+            results, duration = self.recognizer.analyze_segment(y, 16000)
+            self.tone_cache.put(bucket_name, blob.name, blob.generation, config, duration, results)
+            per_blob[blob.name] = (duration, results)
+
+        # Lay the blobs end to end, as if their trimmed audio had been concatenated
+        merged, offset = [], 0.0
+        for blob in found_blobs:
+            duration, results = per_blob[blob.name]
+            for r in results:
+                merged.append({**r, "start": r["start"] + offset, "end": r["end"] + offset})
+            offset += duration
 
-        analysis = analyze_audio_array(combined, rate=16000, num_runs=self.recognizer.num_runs)
+        analysis = _summarize_results_to_dict(merged)
         if analysis is None:
             analysis = {"phases": [], "distribution": {}, "total_duration": 0.0, "avg_confidence": 0.0}
 
@@ -0,0 +1,113 @@
+"""
+Micro-batching for concurrent retrieval requests.
+
+Callers hand a single item to MicroBatcher and block on the result. A
+background thread gathers items arriving within RAG_BATCH_WAIT_MS of the first
+one (up to RAG_BATCH_MAX_SIZE), runs `batch_fn` once over the whole list and
+hands every caller its own slot of the output. Used by retrieve_chunks so that
+concurrent /respond calls share one encoder forward pass and one index.search.
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class MicroBatcher:
+    def __init__(self, batch_fn, max_batch: int | None = None, max_wait_ms: float | None = None, name="micro-batcher"):
+        self.batch_fn = batch_fn
+        self.max_batch = max_batch or int(os.getenv("RAG_BATCH_MAX_SIZE", "32"))
+        wait_ms = float(os.getenv("RAG_BATCH_WAIT_MS", "5")) if max_wait_ms is None else max_wait_ms
+        self.max_wait = wait_ms / 1000.0
+        self._queue: queue.Queue = queue.Queue()
+        self._closed = False
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, item) -> Future:
+        fut: Future = Future()
+        # Checked and enqueued under the lock so nothing can slip in behind close()'s sentinel
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("MicroBatcher is closed")
+            self._queue.put((item, fut))
+        return fut
+
+    def __call__(self, item, timeout: float | None = None):
+        return self.submit(item).result(timeout=timeout)
+
+    def _collect(self):
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                # Drain whatever is already queued without waiting, then wait out the window
+                nxt = self._queue.get_nowait() if remaining <= 0 else self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if nxt is None:
+                # closing: serve what is already batched, and leave the sentinel for the next _collect
+                self._queue.put(None)
+                break
+            batch.append(nxt)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            items = [item for item, _ in batch]
+            futures = [fut for _, fut in batch]
+            try:
+                results = list(self.batch_fn(items))
+                if len(results) != len(items):
+                    raise RuntimeError(f"batch_fn returned {len(results)} results for {len(items)} items")
+                for fut, res in zip(futures, results):
+                    fut.set_result(res)
+            except Exception as e:
+                for fut in futures:
+                    if not fut.done():
+                        fut.set_exception(e)
+            self.batches += 1
+            self.items += len(items)
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": (self.items / self.batches) if self.batches else 0.0,
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000.0,
+        }
+
+    def close(self, timeout: float | None = None):
+        """
+        Stop accepting items and let the worker serve everything queued before
+        the call. Requests it could not reach within `timeout` are failed, so
+        no caller blocks forever on shutdown.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        if self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+        while True:
+            try:
+                pending = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if pending is not None and not pending[1].done():
+                pending[1].set_exception(RuntimeError("MicroBatcher is closed"))
+        # wakes the worker if join timed out mid-batch and the sentinel was drained above
+        self._queue.put(None)
@@ -3,21 +3,20 @@
 Run emotion analysis directly in Cursor using your torchenv environment
 """
 
-from transformers import Wav2Vec2ForSequenceClassification, Wav2Vec2FeatureExtractor
 import torch
 import librosa
 import math
 import numpy as np
 from collections import Counter, deque
 import warnings
+from process_audio_tone import DEFAULT_MODEL, load_wav2vec
 warnings.filterwarnings('ignore')
 
 class SimpleEmotionRecognizer:
-    def __init__(self, model_name="r-f/wav2vec-english-speech-emotion-recognition"):
+    def __init__(self, model_name=DEFAULT_MODEL):
         print(f"Loading emotion recognition model: {model_name}")
-        self.feature_extractor = Wav2Vec2FeatureExtractor.from_pretrained(model_name)
-        self.model = Wav2Vec2ForSequenceClassification.from_pretrained(model_name)
-        self.model.eval()
+        # Same loader and registry entry as the server's tone pipeline
+        self.feature_extractor, self.model = load_wav2vec(model_name)
         print("✓ Model loaded successfully!")
     
     def is_valid_speech(self, audio_chunk, sr):
@@ -1,12 +1,13 @@
 # sr_transcribe_gcs_auto_robust.py
-import os, tempfile, subprocess, json
-from io import BytesIO
-from pathlib import Path
+import os, json, re
+import numpy as np
 from dotenv import load_dotenv
-from google.cloud import storage
-import speech_recognition as sr
-from pydub import AudioSegment, effects
-from pydub.effects import high_pass_filter, low_pass_filter, compress_dynamic_range
+from pydub import AudioSegment
+from asr_backend import get_backend
+from audio_preprocess import config_key as preprocess_config, pcm_to_segment, preprocess_pcm, segment_to_pcm
+from vad import config_key as vad_config, segment_pcm
+from audio_io import fetch_pcm, gcs_client, map_bounded
+from transcript_cache import audio_key, objects_key, segment_key, transcript_cache
 
 # ---------- config ----------
 CHUNK_SEC = 50
@@ -19,180 +20,189 @@ load_dotenv(override=True)
 GCS_BUCKET  = os.getenv("GCS_BUCKET")
 USERS_BASE_PREFIX = os.getenv("USERS_BASE_PREFIX", "users/")
 RECORD_SUBPATH    = os.getenv("RECORD_SUBPATH", "audio/webm/")
-
-if not GCS_BUCKET:
-    raise SystemExit("Set GCS_BUCKET in .env")
+# Written by the frontend's /api/audio route for every uploaded chunk
+AUDIO_FRAMES_COLLECTION = os.getenv("AUDIO_FRAMES_COLLECTION", "audio_frames")
 
 def _gcs():
-    return storage.Client()
+    # One storage client per process, created on first use (see audio_io.py)
+    return gcs_client()
 
-def list_users(bucket_name: str, base_prefix: str):
-    client = _gcs()
-    bucket = client.bucket(bucket_name)
-    blobs = client.list_blobs(bucket, prefix=base_prefix.rstrip("/") + "/", delimiter="/")
-    
-    # Trigger listing to populate prefixes
-    for _ in blobs:
-        pass
-        
-    out = []
-    for prefix in blobs.prefixes:
-        # prefix format: users/user_xxx/
-        user_id = prefix.rstrip("/").split("/")[-1]
-        out.append(user_id)
-    return out
+def _require_bucket(bucket_name: str | None) -> str:
+    bucket_name = bucket_name or GCS_BUCKET
+    if not bucket_name:
+        raise RuntimeError("Set GCS_BUCKET in .env")
+    return bucket_name
+
+def list_latest_user_objects(bucket_name: str, user_id: str, limit=30):
+    """
+    Newest `limit` audio objects of one user, newest first.
+
+    Read from the audio_frames index in Mongo, which /api/audio writes on
+    every upload (clerk_user_id, s3Key, ts_ms, bytes, generation), so the cost
+    is O(limit) no matter how many users or chunks exist. Both sources are limited to the
+    user's RECORD_SUBPATH prefix. If Mongo is unreachable or has no rows for
+    the user, falls back to listing that prefix.
+    """
+    prefix = f"{USERS_BASE_PREFIX.rstrip('/')}/{user_id}/{RECORD_SUBPATH.strip('/')}/"
+    try:
+        from mongodb_fetcher import ensure_index, fetch_latest_from_mongo
+        ensure_index(AUDIO_FRAMES_COLLECTION, [("clerk_user_id", 1), ("ts_ms", -1)])
+        docs = fetch_latest_from_mongo(
+            AUDIO_FRAMES_COLLECTION,
+            # same prefix as the listing below, so other recordings (e.g. audio/mp4/) stay out
+            {"clerk_user_id": user_id, "bytes": {"$gte": MIN_SIZE_BYTES},
+             "s3Key": {"$regex": "^" + re.escape(prefix)}},
+            "ts_ms",
+            limit,
+            projection={"s3Key": 1, "bytes": 1, "ts_ms": 1, "generation": 1},
+        )
+        if docs:
+            items = [{"Key": d["s3Key"], "Size": d.get("bytes", 0), "LastModified": d.get("ts_ms"),
+                      "Generation": int(d["generation"]) if d.get("generation") else None}
+                     for d in docs]
+            return resolve_generations(bucket_name, items)
+    except Exception as e:
+        print(f"audio_frames index unavailable, listing gs://{bucket_name} instead: {e}")
 
-def list_latest_objects(bucket_name: str, users_base: str, record_subpath: str, limit=50):
-    """Return newest objects across ALL users, sorted desc by updated time."""
     client = _gcs()
-    bucket = client.bucket(bucket_name)
     items = []
-    users = list_users(bucket_name, users_base)
-    for user in users:
-        prefix = f"{users_base.rstrip('/')}/{user}/{record_subpath.strip('/')}/"
-        blobs = client.list_blobs(bucket, prefix=prefix)
-        for blob in blobs:
-            key, size, ts = blob.name, blob.size, blob.updated
-            if key.endswith("/") or size < MIN_SIZE_BYTES:  # skip folders & tiny chunks
-                continue
-            items.append({"Key": key, "Size": size, "LastModified": ts})
+    for blob in client.list_blobs(client.bucket(bucket_name), prefix=prefix):
+        if blob.name.endswith("/") or (blob.size or 0) < MIN_SIZE_BYTES:
+            continue
+        items.append({"Key": blob.name, "Size": blob.size, "LastModified": blob.updated, "Generation": blob.generation})
     items.sort(key=lambda x: x["LastModified"], reverse=True)
     return items[:limit]
 
-def download_to_temp(bucket_name: str, key: str) -> str:
-    client = _gcs()
-    bucket = client.bucket(bucket_name)
-    blob = bucket.blob(key)
-    suffix = Path(key).suffix or ".bin"
-    tmp = tempfile.NamedTemporaryFile(suffix=suffix, delete=False)
-    tmp_path = tmp.name; tmp.close()
-    blob.download_to_filename(tmp_path)
-    return tmp_path
-
-# ---- robust decode helpers ----
-def ffmpeg_decode_to_wav_bytes(in_path: str) -> bytes:
-    """Try a tolerant ffmpeg transcode to mono 16k WAV -> bytes."""
-    cmd = [
-        "ffmpeg", "-v", "error",
-        "-fflags", "+genpts+discardcorrupt",
-        "-err_detect", "ignore_err",
-        "-i", in_path,
-        "-ac", "1", "-ar", "16000",
-        "-f", "wav", "pipe:1"
-    ]
-    return subprocess.check_output(cmd, stderr=subprocess.STDOUT)
-
-def load_audio_robust(in_path: str) -> AudioSegment:
+def resolve_generations(bucket_name: str, items: list[dict]) -> list[dict]:
     """
-    Try pydub first; if it fails, fall back to ffmpeg CLI to WAV bytes.
-    Raise on hard failure so caller can try an older object.
+    Fill in the GCS generation of rows indexed without one (written before
+    /api/audio stored it), so the PCM and transcript caches key these objects
+    exactly like tone analysis does. Looked up in parallel; objects that no
+    longer exist are dropped.
     """
-    try:
-        return AudioSegment.from_file(in_path)
-    except Exception:
-        # Fallback: tolerant decode to WAV bytes
-        pcm = ffmpeg_decode_to_wav_bytes(in_path)
-        return AudioSegment.from_file(BytesIO(pcm), format="wav")
+    missing = [item for item in items if item["Generation"] is None]
+    if not missing:
+        return items
+    bucket = _gcs().bucket(bucket_name)
+    blobs = map_bounded(lambda item: bucket.get_blob(item["Key"]), missing)
+    gone = set()
+    for item, blob in zip(missing, blobs):
+        if blob is None or isinstance(blob, Exception):
+            gone.add(item["Key"])
+        else:
+            item["Generation"] = blob.generation
+    return [item for item in items if item["Key"] not in gone]
+
+# ---- decode ----
+def load_pcm_cached(bucket: str, key: str, generation=None, blob=None) -> np.ndarray:
+    """16 kHz mono float32 PCM of a GCS object, shared with tone analysis through the PCM cache."""
+    pcm = fetch_pcm(bucket, key, generation, blob=blob)
+    if len(pcm) == 0:
+        raise RuntimeError("Decoded audio is empty.")
+    return pcm
 
 # ---- preprocessing + ASR ----
 def preprocess(seg: AudioSegment) -> AudioSegment:
-    seg = seg.set_channels(1).set_frame_rate(16000)
-    seg = high_pass_filter(seg, cutoff=100)
-    seg = low_pass_filter(seg, cutoff=8000)
-    seg = effects.normalize(seg)
-    seg = compress_dynamic_range(seg, threshold=-20.0, ratio=4.0, attack=5, release=50)
-    return seg
+    """High/low-pass, normalize and compress (audio_preprocess.py) a segment as 16 kHz mono."""
+    x, sr = segment_to_pcm(seg.set_channels(1).set_frame_rate(16000))
+    return pcm_to_segment(preprocess_pcm(x, sr), sr)
 
-def chunk(seg: AudioSegment, seconds=CHUNK_SEC):
-    step = int(seconds * 1000)
-    return [seg[i:i+step] for i in range(0, len(seg), step)]
+def split_object(pcm: np.ndarray, seconds=CHUNK_SEC) -> list[AudioSegment]:
+    """
+    Preprocess one object's PCM on its own, then cut it into speech-only
+    requests of up to `seconds` at pauses (see vad.py). Working per object keeps
+    its segments, and their cached transcripts, stable as newer audio arrives.
+    """
+    x = preprocess_pcm(pcm)
+    return [pcm_to_segment(part) for part in segment_pcm(x, 16000, max_sec=seconds)]
+
+def transcript_config(engine) -> str:
+    """Everything that shapes a transcript: ASR backend, preprocessing chain and VAD settings."""
+    return f"{engine.config_key()}|{preprocess_config()}|{vad_config()}|chunk={CHUNK_SEC}"
+
+def recognize_chunks(parts, language: str = LANG, backend: str | None = None, keys: list | None = None) -> list[str]:
+    """
+    Transcribe audio segments with the configured ASR backend (ASR_BACKEND, see
+    asr_backend.py); results come back in segment order. Segments already
+    transcribed are served from the transcript cache and only new audio is sent.
+    `keys` are their cache keys (default: a hash of each segment's audio).
+    Raises ASRError on failure.
+    """
+    engine = get_backend(backend, language=language)
+    cache = transcript_cache()
+    if keys is None:
+        config = transcript_config(engine)
+        keys = [audio_key(p.raw_data, config) for p in parts]
+    cached = cache.get_many(keys)
+    todo = [i for i, key in enumerate(keys) if key not in cached]
+    fresh = engine.transcribe_batch([parts[i] for i in todo]) if todo else []
+    cache.put_many({keys[i]: text for i, text in zip(todo, fresh)})
+    texts = [cached.get(key) for key in keys]
+    for i, text in zip(todo, fresh):
+        texts[i] = text
+    recognized = sum(1 for t in texts if t)
+    print(f"[{recognized}/{len(parts)}] chunks recognized ({len(parts) - len(todo)} cached)")
+    return texts
+
+def object_segments(bucket: str, decoded, config: str):
+    """(segments, cache keys) of the (object, pcm) pairs, each keyed on (object, generation, index)."""
+    parts, keys = [], []
+    for obj, pcm in decoded:
+        for i, part in enumerate(split_object(pcm)):
+            parts.append(part)
+            keys.append(segment_key(bucket, obj["Key"], obj.get("Generation"), i, config))
+    return parts, keys
 
 def transcribe_key(bucket: str, key: str) -> str:
-    print(f"Trying: s3://{bucket}/{key}")
-    local = download_to_temp(bucket, key)
-    try:
-        raw = load_audio_robust(local)      # <-- tolerant loader
-        audio = preprocess(raw)
-        parts = chunk(audio)
-        r = sr.Recognizer()
-        texts = []
-        with tempfile.TemporaryDirectory() as td:
-            for i, p in enumerate(parts, 1):
-                wav_path = os.path.join(td, f"part_{i}.wav")
-                p.export(wav_path, format="wav")
-                with sr.AudioFile(wav_path) as src:
-                    r.adjust_for_ambient_noise(src, duration=0.3)
-                    audio_chunk = r.record(src)
-                try:
-                    res = r.recognize_google(audio_chunk, language=LANG, show_all=True)
-                    if isinstance(res, dict) and res.get("alternative"):
-                        best = max(res["alternative"], key=lambda a: a.get("confidence", 0))
-                        texts.append((best.get("transcript") or "").strip())
-                    else:
-                        texts.append(r.recognize_google(audio_chunk, language=LANG).strip())
-                    print(f"[{i}/{len(parts)}] ✓")
-                except sr.UnknownValueError:
-                    print(f"[{i}/{len(parts)}] (no speech recognized)")
-                except sr.RequestError as e:
-                    raise SystemExit(f"[{i}/{len(parts)}] API error: {e}")
-        out = " ".join(t for t in texts if t).strip()
-        if not out:
-            raise RuntimeError("Empty transcript (audio may be silence).")
-        return out
-    finally:
-        try: os.remove(local)
-        except OSError: pass
-
-def collect_last_k_decodable(bucket: str, candidates: list[dict], k: int = 3):
-    """Try candidates newest->oldest, decode those that work (up to k), return a single concatenated AudioSegment."""
-    got = []
-    for obj in candidates:
-        key = obj["Key"]
-        try:
-            local = download_to_temp(bucket, key)
-            raw = load_audio_robust(local)
-            got.append(raw)
-            print(f"collected: {key}")
-            if len(got) >= k:
-                break
-        except Exception as e:
-            print(f"skip {key}: {e}")
-        finally:
-            try: os.remove(local)
-            except: pass
+    print(f"Trying: gs://{bucket}/{key}")
+    blob = _gcs().bucket(bucket).get_blob(key)
+    if blob is None:
+        raise FileNotFoundError(f"gs://{bucket}/{key} not found")
+    pcm = load_pcm_cached(bucket, key, blob.generation, blob=blob)  # <-- tolerant, cached decode
+    config = transcript_config(get_backend(language=LANG))
+    parts, keys = object_segments(bucket, [({"Key": key, "Generation": blob.generation}, pcm)], config)
+    texts = recognize_chunks(parts, keys=keys)
+    out = " ".join(t for t in texts if t).strip()
+    if not out:
+        raise RuntimeError("Empty transcript (audio may be silence).")
+    return out
+
+def collect_last_k_decodable(bucket: str, candidates: list[dict], k: int = 3) -> list[tuple[dict, np.ndarray]]:
+    """Try candidates newest->oldest and return (object, pcm) for those that decode (up to k), newest first."""
+    got, pos = [], 0
+    # Fetch the missing number of candidates in parallel; older ones are only reached if some fail to decode
+    while len(got) < k and pos < len(candidates):
+        batch = candidates[pos:pos + k - len(got)]
+        pos += len(batch)
+        decoded = map_bounded(lambda obj: load_pcm_cached(bucket, obj["Key"], obj.get("Generation")), batch)
+        for obj, pcm in zip(batch, decoded):
+            if isinstance(pcm, Exception):
+                print(f"skip {obj['Key']}: {pcm}")
+                continue
+            got.append((obj, pcm))
+            print(f"collected: {obj['Key']}")
     if not got:
         raise RuntimeError("No decodable audio found.")
-    # concatenate and preprocess once
-    merged = got[0]
-    for seg in got[1:]:
-        merged += seg
-    return preprocess(merged)
-
-def transcribe_latest_concat(bucket: str, k: int = 3, pool=30) -> str:
-    # newest N across all users (you already have list_latest_objects)
-    candidates = list_latest_objects(bucket, USERS_BASE_PREFIX, RECORD_SUBPATH, limit=pool)
-    merged = collect_last_k_decodable(bucket, candidates, k=k)
-    parts = chunk(merged)
-    r = sr.Recognizer()
-    out = []
-    with tempfile.TemporaryDirectory() as td:
-        for i, p in enumerate(parts, 1):
-            wav = os.path.join(td, f"part_{i}.wav")
-            p.export(wav, format="wav")
-            with sr.AudioFile(wav) as src:
-                r.adjust_for_ambient_noise(src, duration=0.3)
-                audio_chunk = r.record(src)
-            try:
-                res = r.recognize_google(audio_chunk, language=LANG, show_all=True)
-                if isinstance(res, dict) and res.get("alternative"):
-                    best = max(res["alternative"], key=lambda a: a.get("confidence", 0))
-                    out.append((best.get("transcript") or "").strip())
-                else:
-                    out.append(r.recognize_google(audio_chunk, language=LANG).strip())
-                print(f"[{i}/{len(parts)}] ✓")
-            except sr.UnknownValueError:
-                print(f"[{i}/{len(parts)}] (no speech recognized)")
-            except sr.RequestError as e:
-                raise SystemExit(f"[{i}/{len(parts)}] API error: {e}")
-    return " ".join(t for t in out if t).strip()
-
+    return got
+
+def transcribe_latest_concat(bucket: str, user_id: str, k: int = 3, pool=30) -> str:
+    bucket = _require_bucket(bucket)
+    # newest `pool` chunks of this user only, from the audio_frames index
+    candidates = list_latest_user_objects(bucket, user_id, limit=pool)
+    config = transcript_config(get_backend(language=LANG))
+    # Same newest objects (and generations) as last time -> same transcript, no download or ASR
+    newest = [(obj["Key"], obj.get("Generation")) for obj in candidates[:k]]
+    request_key = objects_key(bucket, newest, config)
+    cached = transcript_cache().get(request_key)
+    if cached is not None:
+        print(f"transcript cached for {len(newest)} newest objects")
+        return cached
+    decoded = collect_last_k_decodable(bucket, candidates, k=k)
+    # Each object is preprocessed and segmented separately, so only segments of new objects miss the cache
+    parts, keys = object_segments(bucket, decoded, config)
+    out = recognize_chunks(parts, keys=keys)
+    text = " ".join(t for t in out if t).strip()
+    # Only cache under the newest-k key if exactly those objects went in (not after a skipped/failed one)
+    if [(obj["Key"], obj.get("Generation")) for obj, _ in decoded] == newest:
+        transcript_cache().put(request_key, text)
+    return text
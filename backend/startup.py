@@ -0,0 +1,149 @@
+"""
+Background loading of the backend's heavy components.
+
+Each component (embedding model, FAISS index, wav2vec tone model, DeepFace,
+Gemini client, ...) is registered with a loader function that does its own
+imports, plus an optional warm-up that pushes a synthetic input through the
+loaded model. ComponentLoader.start() runs every loader concurrently on a
+thread pool, so uvicorn accepts connections immediately and each endpoint only
+waits for the components it actually uses. A component is reported ready only
+after its warm-up has run, so the first real request never pays for lazy
+initialization or graph tracing.
+"""
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ComponentNotReady(RuntimeError):
+    """Raised when a request needs a component that is still loading or failed to load."""
+
+    def __init__(self, name: str, status: str, error: str | None = None):
+        self.name = name
+        self.status = status
+        self.error = error
+        msg = f"Component '{name}' is {status}"
+        super().__init__(f"{msg}: {error}" if error else msg)
+
+
+class Component:
+    def __init__(self, name: str, loader, depends_on=(), warmup=None):
+        self.name = name
+        self.loader = loader
+        self.depends_on = tuple(depends_on)
+        self.warmup = warmup
+        self.status = "pending"
+        self.value = None
+        self.error: str | None = None
+        self.load_seconds: float | None = None
+        self.warmup_seconds: float | None = None
+        self.done = threading.Event()
+
+    def describe(self) -> dict:
+        out = {"status": self.status}
+        if self.load_seconds is not None:
+            out["load_seconds"] = round(self.load_seconds, 3)
+        if self.warmup_seconds is not None:
+            out["warmup_seconds"] = round(self.warmup_seconds, 3)
+        if self.error:
+            out["error"] = self.error
+        return out
+
+
+class ComponentLoader:
+    def __init__(self, max_workers: int | None = None):
+        self.components: dict[str, Component] = {}
+        self.max_workers = max_workers or int(os.getenv("STARTUP_LOAD_WORKERS", "4"))
+        self.warmup_enabled = os.getenv("WARMUP_ENABLED", "1") != "0"
+        self._executor: ThreadPoolExecutor | None = None
+        self.started_at: float | None = None
+
+    def register(self, name: str, loader, depends_on=(), warmup=None):
+        self.components[name] = Component(name, loader, depends_on, warmup)
+
+    def start(self):
+        if self._executor is not None:
+            return
+        self.started_at = time.time()
+        # STARTUP_LOAD_WORKERS caps how many models load at once (memory and CPU spike at boot)
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, min(self.max_workers, len(self.components))), thread_name_prefix="loader"
+        )
+        for comp in self._dependency_order():
+            self._executor.submit(self._load, comp)
+
+    def _dependency_order(self) -> list[Component]:
+        """
+        Components with their dependencies first. The pool runs tasks in
+        submission order, so a loader blocked on a dependency never holds the
+        last free worker while that dependency is still queued.
+        """
+        ordered, seen = [], set()
+
+        def visit(comp: Component):
+            if comp.name in seen:
+                return
+            seen.add(comp.name)
+            for dep in comp.depends_on:
+                visit(self.components[dep])
+            ordered.append(comp)
+
+        for comp in self.components.values():
+            visit(comp)
+        return ordered
+
+    def _load(self, comp: Component):
+        try:
+            deps = [self.get(dep) for dep in comp.depends_on]
+            comp.status = "loading"
+            t0 = time.time()
+            comp.value = comp.loader(*deps)
+            comp.load_seconds = time.time() - t0
+            if comp.warmup is not None and self.warmup_enabled:
+                comp.status = "warming"
+                t0 = time.time()
+                comp.warmup(comp.value)
+                comp.warmup_seconds = time.time() - t0
+            comp.status = "ready"
+            warm = f", warm-up {comp.warmup_seconds:.1f}s" if comp.warmup_seconds is not None else ""
+            print(f"✓ {comp.name} ready in {comp.load_seconds:.1f}s{warm}")
+        except Exception as e:
+            comp.status = "failed"
+            comp.error = f"{type(e).__name__}: {e}"
+            print(f"❌ {comp.name} failed to load: {comp.error}")
+            traceback.print_exc()
+        finally:
+            comp.done.set()
+
+    def get(self, name: str, timeout: float | None = None):
+        """Return a loaded component, waiting up to `timeout` seconds (None = forever)."""
+        comp = self.components[name]
+        if not comp.done.wait(timeout):
+            raise ComponentNotReady(name, comp.status)
+        if comp.status != "ready":
+            raise ComponentNotReady(name, comp.status, comp.error)
+        return comp.value
+
+    def require(self, *names: str, timeout: float | None = None):
+        """get() several components; a single name returns the value itself."""
+        if timeout is None:
+            timeout = float(os.getenv("COMPONENT_WAIT_SEC", "30"))
+        values = [self.get(name, timeout) for name in names]
+        return values[0] if len(values) == 1 else values
+
+    def is_ready(self, *names: str) -> bool:
+        names = names or tuple(self.components)
+        return all(self.components[n].status == "ready" for n in names)
+
+    def readiness(self) -> dict:
+        """Summary for load-balancer health checks: ready only once every component is loaded and warm."""
+        return {
+            "ready": self.is_ready(),
+            "uptime_seconds": round(time.time() - self.started_at, 3) if self.started_at else 0.0,
+            "components": self.status(),
+        }
+
+    def status(self) -> dict:
+        return {name: comp.describe() for name, comp in self.components.items()}
@@ -0,0 +1,142 @@
+"""
+Persistent per-blob cache of tone-analysis window results.
+
+process_gcs_frames used to download and re-analyze every audio chunk a user
+has ever uploaded on each call. Results are now stored per GCS object, keyed
+by (bucket, name, generation, analysis config), so a call only analyzes blobs
+that are new or were overwritten since the last one and merges the cached
+windows for the rest. Overwriting an object bumps its generation, and any
+older rows for that name are dropped when the new result is written.
+
+Rows written under an analysis config other than the current one can never
+be hit again, so the first write with a new config purges them. Hits refresh
+a row's updated_at, and the least recently used rows are evicted once the
+table grows past the entry limit.
+
+    TONE_CACHE_PATH          SQLite file (default backend/.cache/tone_results.sqlite, empty = disabled)
+    TONE_CACHE_MAX_ENTRIES   rows kept before LRU eviction (default 50000)
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_PATH = os.path.join(os.path.dirname(__file__), ".cache", "tone_results.sqlite")
+
+
+class ToneCache:
+    def __init__(self, path: str | None = None, max_entries: int | None = None):
+        self.path = path if path is not None else os.getenv("TONE_CACHE_PATH", DEFAULT_PATH)
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv("TONE_CACHE_MAX_ENTRIES", "50000"))
+        self._lock = threading.Lock()
+        self._conn = None
+        self._config = None  # config whose stale siblings were last purged
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if self.path and self.max_entries > 0:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS blob_results (
+                    bucket TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    generation INTEGER NOT NULL,
+                    config TEXT NOT NULL,
+                    duration REAL NOT NULL,
+                    results TEXT NOT NULL,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (bucket, name, generation, config)
+                )"""
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS blob_results_updated_at ON blob_results (updated_at)")
+            self._conn.commit()
+
+    @property
+    def enabled(self) -> bool:
+        return self._conn is not None
+
+    def get_many(self, bucket: str, blobs, config: str) -> dict:
+        """
+        Look up (name, generation) pairs; returns {name: (duration_seconds, results)}
+        for the ones already analyzed with this config.
+        """
+        blobs = list(blobs)
+        found = {}
+        if self._conn is not None and blobs:
+            with self._lock:
+                for name, generation in blobs:
+                    row = self._conn.execute(
+                        "SELECT duration, results FROM blob_results "
+                        "WHERE bucket=? AND name=? AND generation=? AND config=?",
+                        (bucket, name, int(generation or 0), config),
+                    ).fetchone()
+                    if row is not None:
+                        found[name] = (row[0], json.loads(row[1]))
+                if found:
+                    now = time.time()
+                    self._conn.executemany(
+                        "UPDATE blob_results SET updated_at=? WHERE bucket=? AND name=? AND config=?",
+                        [(now, bucket, name, config) for name in found])
+                    self._conn.commit()
+        self.hits += len(found)
+        self.misses += len(blobs) - len(found)
+        return found
+
+    def put(self, bucket: str, name: str, generation, config: str, duration: float, results: list[dict]) -> None:
+        """Store one blob's results, replacing older generations, then evict LRU rows past max_entries."""
+        if self._conn is None:
+            return
+        rows = [
+            {"emotion": r["emotion"], "confidence": float(r["confidence"]),
+             "start": float(r["start"]), "end": float(r["end"])}
+            for r in results
+        ]
+        with self._lock:
+            if config != self._config:
+                # analysis settings changed: rows from the old config can never be hit again
+                purged = self._conn.execute("DELETE FROM blob_results WHERE config<>?", (config,)).rowcount
+                if purged:
+                    print(f"tone cache: dropped {purged} results from an older analysis config")
+                self._config = config
+            self._conn.execute(
+                "DELETE FROM blob_results WHERE bucket=? AND name=? AND generation<>?",
+                (bucket, name, int(generation or 0)),
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO blob_results VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (bucket, name, int(generation or 0), config, float(duration), json.dumps(rows), time.time()),
+            )
+            count = self._conn.execute("SELECT COUNT(*) FROM blob_results").fetchone()[0]
+            if count > self.max_entries:
+                # drop down to 90% so eviction does not run on every insert
+                excess = count - int(self.max_entries * 0.9)
+                self._conn.execute(
+                    "DELETE FROM blob_results WHERE rowid IN "
+                    "(SELECT rowid FROM blob_results ORDER BY updated_at LIMIT ?)", (excess,))
+                self.evictions += excess
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        entries = 0
+        if self._conn is not None:
+            with self._lock:
+                entries = self._conn.execute("SELECT COUNT(*) FROM blob_results").fetchone()[0]
+        return {
+            "enabled": self.enabled,
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / total) if total else 0.0,
+            "evictions": self.evictions,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,152 @@
+"""
+Persistent, content-addressed cache of transcripts.
+
+/process_speech and /detect_video_emotions both transcribe a user's newest
+audio chunks, and consecutive calls used to send the same audio to ASR again.
+Transcripts are now stored under two kinds of key:
+
+- segment keys: the (object, generation, segment index) an ASR request was
+  cut from, or for uploaded files a hash of its exact 16-bit PCM, plus the
+  backend, preprocessing and VAD settings (recognize_chunks). Each object is
+  preprocessed and segmented on its own, so its segments do not change when
+  newer audio arrives and only audio never transcribed before is sent;
+- request keys: a hash of the (object, generation) set a transcript was built
+  from (transcribe_latest_concat), so when nothing new was recorded the
+  transcript comes back without downloading or decoding anything.
+
+Rows live in SQLite, shared by every process on the host, and the least
+recently used ones are evicted once the table grows past the entry limit.
+
+    TRANSCRIPT_CACHE_PATH          SQLite file (default backend/.cache/transcripts.sqlite, empty = disabled)
+    TRANSCRIPT_CACHE_MAX_ENTRIES   rows kept before LRU eviction (default 20000)
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_PATH = os.path.join(os.path.dirname(__file__), ".cache", "transcripts.sqlite")
+
+
+def audio_key(raw: bytes, config: str) -> str:
+    """Key of one ASR request: its PCM bytes plus the backend/language config."""
+    return "seg:" + hashlib.sha1(config.encode() + b"\0" + raw).hexdigest()
+
+
+def segment_key(bucket: str, name: str, generation, index: int, config: str) -> str:
+    """Key of the index-th ASR request cut from one (name, generation) object."""
+    return "part:" + hashlib.sha1(f"{config}\n{bucket}\n{name}#{generation or 0}\n{index}".encode()).hexdigest()
+
+
+def objects_key(bucket: str, objects, config: str) -> str:
+    """Key of a transcript built from these (name, generation) objects, in order."""
+    ids = "\n".join(f"{name}#{generation or 0}" for name, generation in objects)
+    return "obj:" + hashlib.sha1(f"{config}\n{bucket}\n{ids}".encode()).hexdigest()
+
+
+class TranscriptCache:
+    def __init__(self, path: str | None = None, max_entries: int | None = None):
+        self.path = path if path is not None else os.getenv("TRANSCRIPT_CACHE_PATH", DEFAULT_PATH)
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv("TRANSCRIPT_CACHE_MAX_ENTRIES", "20000"))
+        self._lock = threading.Lock()
+        self._conn = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if self.path and self.max_entries > 0:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS transcripts (
+                    key TEXT PRIMARY KEY,
+                    text TEXT NOT NULL,
+                    last_used REAL NOT NULL
+                )"""
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS transcripts_last_used ON transcripts (last_used)")
+            self._conn.commit()
+
+    @property
+    def enabled(self) -> bool:
+        return self._conn is not None
+
+    def get_many(self, keys) -> dict:
+        """{key: text} for the keys that are cached; hits are marked as recently used."""
+        keys = list(keys)
+        found = {}
+        if self._conn is not None and keys:
+            with self._lock:
+                for key in keys:
+                    row = self._conn.execute("SELECT text FROM transcripts WHERE key=?", (key,)).fetchone()
+                    if row is not None:
+                        found[key] = row[0]
+                if found:
+                    now = time.time()
+                    self._conn.executemany("UPDATE transcripts SET last_used=? WHERE key=?",
+                                           [(now, key) for key in found])
+                    self._conn.commit()
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def get(self, key: str) -> str | None:
+        return self.get_many([key]).get(key)
+
+    def put_many(self, items: dict) -> None:
+        """Store {key: text}, then evict least recently used rows past max_entries."""
+        if self._conn is None or not items:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO transcripts VALUES (?, ?, ?)",
+                                   [(key, text, now) for key, text in items.items()])
+            count = self._conn.execute("SELECT COUNT(*) FROM transcripts").fetchone()[0]
+            if count > self.max_entries:
+                # drop down to 90% so eviction does not run on every insert
+                excess = count - int(self.max_entries * 0.9)
+                self._conn.execute(
+                    "DELETE FROM transcripts WHERE key IN "
+                    "(SELECT key FROM transcripts ORDER BY last_used LIMIT ?)", (excess,))
+                self.evictions += excess
+            self._conn.commit()
+
+    def put(self, key: str, text: str) -> None:
+        self.put_many({key: text})
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        entries = 0
+        if self._conn is not None:
+            with self._lock:
+                entries = self._conn.execute("SELECT COUNT(*) FROM transcripts").fetchone()[0]
+        return {
+            "enabled": self.enabled,
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / total) if total else 0.0,
+            "evictions": self.evictions,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def transcript_cache() -> TranscriptCache:
+    """The process-wide cache (created on first use)."""
+    global _default
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                _default = TranscriptCache()
+    return _default
@@ -0,0 +1,128 @@
+"""
+Energy-based voice activity detection and segmentation for transcription.
+
+Instead of cutting audio at fixed 30/50 s offsets (which splits words at the
+boundaries and sends long silences to the recognizer), segment_pcm:
+
+1. measures frame energy (VAD_FRAME_MS frames) and marks frames above an
+   adaptive threshold: VAD_MARGIN_DB over the noise floor (10th percentile
+   frame), never below VAD_FLOOR_DB;
+2. bridges pauses shorter than VAD_MIN_SILENCE_MS, drops blips shorter than
+   VAD_MIN_SPEECH_MS and pads each speech region by VAD_PAD_MS;
+3. splits regions longer than the request limit at their quietest frame;
+4. packs consecutive regions, silence removed, into requests of up to
+   `max_sec`, so a session makes as few, as full ASR calls as possible.
+
+Input is mono float PCM (see audio_preprocess.py), ideally already normalized.
+
+    VAD_FRAME_MS         analysis frame length (default 30)
+    VAD_MARGIN_DB        speech threshold above the noise floor (default 12)
+    VAD_FLOOR_DB         lowest speech threshold, dBFS (default -50)
+    VAD_MIN_SILENCE_MS   shorter pauses stay inside a region (default 400)
+    VAD_MIN_SPEECH_MS    shorter bursts are dropped (default 150)
+    VAD_PAD_MS           audio kept around each region (default 200)
+"""
+import os
+
+import numpy as np
+
+# Bump when the segmentation algorithm changes, so transcripts cached per segment are recomputed
+VERSION = 1
+FRAME_MS = int(os.getenv("VAD_FRAME_MS", "30"))
+MARGIN_DB = float(os.getenv("VAD_MARGIN_DB", "12"))
+FLOOR_DB = float(os.getenv("VAD_FLOOR_DB", "-50"))
+MIN_SILENCE_MS = int(os.getenv("VAD_MIN_SILENCE_MS", "400"))
+MIN_SPEECH_MS = int(os.getenv("VAD_MIN_SPEECH_MS", "150"))
+PAD_MS = int(os.getenv("VAD_PAD_MS", "200"))
+
+
+def frame_db(x: np.ndarray, frame_len: int) -> np.ndarray:
+    """RMS level in dBFS of consecutive frame_len-sample frames (last one zero-padded)."""
+    n = -(-len(x) // frame_len)
+    frames = np.zeros(n * frame_len, dtype=np.float64)
+    frames[:len(x)] = x
+    rms = np.sqrt(np.mean(frames.reshape(n, frame_len) ** 2, axis=1))
+    return 20 * np.log10(rms + 1e-10)
+
+
+def _runs(active: np.ndarray) -> np.ndarray:
+    """(start, end) frame index pairs of the True runs in a boolean array."""
+    edges = np.diff(np.concatenate([[0], active.astype(np.int8), [0]]))
+    return np.stack([np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)], axis=1)
+
+
+def speech_regions(x: np.ndarray, sr: int = 16000) -> tuple[list[tuple[int, int]], np.ndarray, int]:
+    """Padded (start, end) sample ranges of speech, plus the frame levels and frame length used."""
+    frame_len = max(1, sr * FRAME_MS // 1000)
+    if len(x) == 0:
+        return [], np.zeros(0), frame_len
+    db = frame_db(x, frame_len)
+    noise, peak = np.percentile(db, 10), db.max()
+    # noise + margin, but never above peak - margin (speech with no pauses) nor below the floor
+    threshold = max(FLOOR_DB, min(noise + MARGIN_DB, peak - MARGIN_DB))
+    runs = _runs(db > threshold)
+    if len(runs) == 0:
+        return [], db, frame_len
+
+    # bridge short pauses, then drop short blips
+    min_gap = MIN_SILENCE_MS / FRAME_MS
+    merged = [list(runs[0])]
+    for start, end in runs[1:]:
+        if start - merged[-1][1] < min_gap:
+            merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    min_len = MIN_SPEECH_MS / FRAME_MS
+    pad = sr * PAD_MS // 1000
+
+    regions = []
+    for start, end in merged:
+        if end - start < min_len:
+            continue
+        lo, hi = max(0, start * frame_len - pad), min(len(x), end * frame_len + pad)
+        if regions and lo <= regions[-1][1]:
+            regions[-1] = (regions[-1][0], hi)
+        else:
+            regions.append((lo, hi))
+    return regions, db, frame_len
+
+
+def split_long(regions, db: np.ndarray, frame_len: int, max_len: int) -> list[tuple[int, int]]:
+    """Cut regions longer than max_len samples at the quietest frame of their last 40%."""
+    out = []
+    for start, end in regions:
+        while end - start > max_len:
+            lo = (start + int(max_len * 0.6)) // frame_len + 1
+            hi = (start + max_len) // frame_len
+            cut = (lo + int(np.argmin(db[lo:hi]))) * frame_len if hi > lo else start + max_len
+            out.append((start, cut))
+            start = cut
+        out.append((start, end))
+    return out
+
+
+def pack(regions, max_len: int) -> list[list[tuple[int, int]]]:
+    """Greedily group consecutive regions into requests of at most max_len samples of audio."""
+    groups, size = [], 0
+    for start, end in regions:
+        if groups and size + (end - start) <= max_len:
+            groups[-1].append((start, end))
+            size += end - start
+        else:
+            groups.append([(start, end)])
+            size = end - start
+    return groups
+
+
+def segment_pcm(x: np.ndarray, sr: int = 16000, max_sec: float = 30) -> list[np.ndarray]:
+    """Speech-only PCM requests of at most max_sec seconds each, cut at pauses."""
+    max_len = int(max_sec * sr)
+    regions, db, frame_len = speech_regions(x, sr)
+    groups = pack(split_long(regions, db, frame_len, max_len), max_len)
+    return [np.concatenate([x[s:e] for s, e in group]) for group in groups]
+
+
+def config_key() -> str:
+    """Identifies the segmentation settings (used to key cached transcripts)."""
+    return (f"vad-v{VERSION}|frame={FRAME_MS}|margin={MARGIN_DB:g}|floor={FLOOR_DB:g}"
+            f"|silence={MIN_SILENCE_MS}|speech={MIN_SPEECH_MS}|pad={PAD_MS}")
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+FAISS index selection, serialization and loading for the RAG retriever.
+
+FAISS_INDEX_KIND picks the index type:
+    flat   exact inner-product search (baseline)
+    hnsw   graph index, HNSW_M / HNSW_EF_SEARCH
+    ivf    inverted lists, IVF_NLIST / IVF_NPROBE
+    ivfpq  inverted lists with product quantization, plus PQ_M / PQ_NBITS
+
+Trained indexes are written to FAISS_INDEX_PATH (default backend/dsm5_<kind>.faiss)
+with a JSON sidecar recording the embeddings fingerprint they were built from,
+and are loaded with faiss.read_index on later boots instead of being rebuilt.
+Builds, saves and loads of one path are serialized with file_lock (file_lock.py).
+
+Build ahead of time with:  python backend/vector_index.py --kind hnsw
+"""
+import argparse
+import json
+import math
+import os
+import time
+
+import numpy as np
+
+from file_lock import file_lock, temp_path
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+INDEX_KINDS = ("flat", "hnsw", "ivf", "ivfpq")
+
+
+def index_settings(kind: str | None = None) -> dict:
+    kind = (kind or os.getenv("FAISS_INDEX_KIND", "flat")).lower()
+    if kind not in INDEX_KINDS:
+        raise ValueError(f"FAISS_INDEX_KIND must be one of {INDEX_KINDS}, got {kind!r}")
+    return {
+        "kind": kind,
+        "hnsw_m": int(os.getenv("HNSW_M", "32")),
+        "hnsw_ef_construction": int(os.getenv("HNSW_EF_CONSTRUCTION", "200")),
+        "hnsw_ef_search": int(os.getenv("HNSW_EF_SEARCH", "64")),
+        "ivf_nlist": int(os.getenv("IVF_NLIST", "0")),  # 0 = derive from corpus size
+        "ivf_nprobe": int(os.getenv("IVF_NPROBE", "8")),
+        "pq_m": int(os.getenv("PQ_M", "16")),
+        "pq_nbits": int(os.getenv("PQ_NBITS", "8")),
+    }
+
+
+def default_index_path(kind: str) -> str:
+    return os.getenv("FAISS_INDEX_PATH", os.path.join(BACKEND_DIR, f"dsm5_{kind}.faiss"))
+
+
+def _nlist_for(n: int, requested: int) -> int:
+    if requested > 0:
+        return min(requested, n)
+    # ~4*sqrt(n) lists, keeping at least ~39 training points per list as FAISS recommends
+    return max(1, min(int(4 * math.sqrt(n)), n // 39 or 1))
+
+
+def build_index(embeddings: np.ndarray, settings: dict):
+    """Build and train an inner-product index over L2-normalized embeddings."""
+    import faiss
+
+    n, d = embeddings.shape
+    kind = settings["kind"]
+    if kind == "flat":
+        index = faiss.IndexFlatIP(d)
+    elif kind == "hnsw":
+        index = faiss.IndexHNSWFlat(d, settings["hnsw_m"], faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = settings["hnsw_ef_construction"]
+    else:
+        nlist = _nlist_for(n, settings["ivf_nlist"])
+        quantizer = faiss.IndexFlatIP(d)
+        if kind == "ivf":
+            index = faiss.IndexIVFFlat(quantizer, d, nlist, faiss.METRIC_INNER_PRODUCT)
+        else:
+            if d % settings["pq_m"]:
+                raise ValueError(f"PQ_M={settings['pq_m']} must divide the embedding dim {d}")
+            index = faiss.IndexIVFPQ(quantizer, d, nlist, settings["pq_m"], settings["pq_nbits"],
+                                     faiss.METRIC_INNER_PRODUCT)
+        index.train(embeddings)
+    index.add(embeddings)
+    apply_search_settings(index, settings)
+    return index
+
+
+def apply_search_settings(index, settings: dict) -> None:
+    """Search-time knobs are not always round-tripped by write_index, so set them after loading too."""
+    import faiss
+
+    if settings["kind"] == "hnsw":
+        index.hnsw.efSearch = settings["hnsw_ef_search"]
+    elif settings["kind"] in ("ivf", "ivfpq"):
+        faiss.extract_index_ivf(index).nprobe = settings["ivf_nprobe"]
+
+
+def _read_sidecar(path: str) -> dict | None:
+    try:
+        with open(path + ".json") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_index(index, path: str, settings: dict, fingerprint: str | None) -> None:
+    """
+    Write the index and its sidecar under unique temporary names, then rename
+    them into place. Callers hold file_lock(path) so concurrent writers and
+    readers never see one file of a pair from another build.
+    """
+    import faiss
+
+    tmp_index, tmp_sidecar = temp_path(path), temp_path(path + ".json")
+    try:
+        faiss.write_index(index, tmp_index)
+        with open(tmp_sidecar, "w") as f:
+            json.dump({"settings": settings, "embeddings_sha256": fingerprint, "ntotal": int(index.ntotal)}, f, indent=2)
+        os.replace(tmp_index, path)
+        os.replace(tmp_sidecar, path + ".json")
+    finally:
+        for tmp in (tmp_index, tmp_sidecar):
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+
+def load_or_build_index(embeddings: np.ndarray, settings: dict | None = None,
+                        path: str | None = None, fingerprint: str | None = None):
+    """
+    Return the configured index, reading it from disk when a serialized copy
+    built from the same embeddings exists and building (then saving) it otherwise.
+    A flat index is cheap to build and is never written to disk. Workers
+    booting together take turns on file_lock(path): one builds, the rest load it.
+    """
+    import faiss
+
+    settings = settings or index_settings()
+    if settings["kind"] == "flat":
+        return build_index(embeddings, settings)
+
+    path = path or default_index_path(settings["kind"])
+    build_settings = {k: v for k, v in settings.items() if k not in ("hnsw_ef_search", "ivf_nprobe")}
+    with file_lock(path):
+        sidecar = _read_sidecar(path)
+        if (
+            sidecar is not None
+            and os.path.exists(path)
+            and sidecar.get("ntotal") == embeddings.shape[0]
+            and sidecar.get("embeddings_sha256") == fingerprint
+            and {k: sidecar["settings"].get(k) for k in build_settings} == build_settings
+        ):
+            t0 = time.time()
+            index = faiss.read_index(path)
+            if index.ntotal == sidecar["ntotal"]:
+                apply_search_settings(index, settings)
+                print(f"Loaded {settings['kind']} index from {path} in {time.time() - t0:.2f}s")
+                return index
+            print(f"{path} has {index.ntotal} vectors, sidecar says {sidecar['ntotal']}; rebuilding")
+
+        t0 = time.time()
+        index = build_index(embeddings, settings)
+        print(f"Built {settings['kind']} index in {time.time() - t0:.2f}s")
+        try:
+            save_index(index, path, settings, fingerprint)
+        except OSError as e:
+            print(f"Could not save index to {path}: {e}")
+        return index
+
+
+def main():
+    import faiss
+    from chunk_store import ChunkStore, DEFAULT_EMBEDDINGS_PATH
+
+    parser = argparse.ArgumentParser(description="Build and serialize the retriever's FAISS index")
+    parser.add_argument("--kind", choices=INDEX_KINDS, default=None)
+    parser.add_argument("--embeddings", default=DEFAULT_EMBEDDINGS_PATH)
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args()
+
+    settings = index_settings(args.kind)
+    embeddings = np.load(args.embeddings).astype(np.float32)
+    faiss.normalize_L2(embeddings)
+    fingerprint = ChunkStore().meta.get("embeddings_sha256")
+    path = args.out or default_index_path(settings["kind"])
+    if settings["kind"] == "flat":
+        print("flat index is built at startup; nothing to write")
+        return
+    index = build_index(embeddings, settings)
+    with file_lock(path):
+        save_index(index, path, settings, fingerprint)
+    print(f"Wrote {path} ({index.ntotal} vectors)")
+
+
+if __name__ == "__main__":
+    main()
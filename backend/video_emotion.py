@@ -0,0 +1,307 @@
+"""
+Facial-emotion analysis of uploaded videos.
+
+Running DeepFace on every decoded frame is wasteful: a 30fps clip is sampled
+down to VIDEO_TARGET_FPS, and sampled frames that barely differ from the last
+analyzed one (mean absolute difference of small grayscale thumbnails below
+VIDEO_DIFF_THRESHOLD, on a 0-255 scale) are skipped too. Skipped frames carry
+the previous label forward, so the per-frame emotion list keeps one entry per
+decoded frame.
+
+Frames that need a label are run through face detection as they are decoded,
+and their face crops are classified VIDEO_BATCH_SIZE at a time in a single
+forward pass of DeepFace's emotion CNN instead of one DeepFace.analyze call
+per frame. Preprocessing mirrors DeepFace.analyze, so labels match.
+
+With VIDEO_DETECT_EVERY=K (K > 1) the face detector runs only on every K-th
+analyzed frame; in between, the face box is propagated with a lightweight
+OpenCV tracker and only the emotion classifier runs on the tracked crop. When
+the tracker loses the face the frame falls back to full detection.
+
+Decoding runs on its own thread and hands frames to the inference loop through
+a bounded queue (VIDEO_DECODE_QUEUE frames), so decoding frame N+1 overlaps
+face detection and classification of frame N.
+
+    VIDEO_TARGET_FPS       frames analyzed per second of video (default 5, 0 = every frame)
+    VIDEO_DIFF_THRESHOLD   scene-change threshold (default 2.0, 0 = analyze every sampled frame)
+    VIDEO_BATCH_SIZE       face crops per emotion-model forward pass (default 16)
+    VIDEO_FACE_DETECTOR    DeepFace detector backend (default opencv, as DeepFace.analyze)
+    VIDEO_DETECT_EVERY     run face detection every K analyzed frames, tracking in between (default 0 = always detect)
+    VIDEO_TRACKER          OpenCV tracker used between detections: kcf, csrt or mil (default kcf, falls back to mil)
+    VIDEO_DECODE_QUEUE     decoded frames buffered between the decode thread and inference (default 8)
+"""
+import os
+import queue
+import threading
+
+import numpy as np
+
+THUMB_SIZE = (64, 36)
+
+
+class EmotionDetector:
+    def __init__(self, detector_backend: str | None = None):
+        # Importing deepface pulls in TensorFlow; building the model loads its weights once.
+        from deepface import DeepFace
+        from deepface.models.demography import Emotion
+        from deepface.modules import preprocessing
+
+        self._deepface = DeepFace
+        self._resize_image = preprocessing.resize_image
+        self.labels = list(Emotion.labels)
+        self.detector_backend = detector_backend or os.getenv("VIDEO_FACE_DETECTOR", "opencv")
+        self.model = DeepFace.build_model(task="facial_attribute", model_name="Emotion")
+
+    def detect(self, frame):
+        """
+        Detect the first face in a BGR frame and return (model_input, box).
+        model_input is None if nothing usable was found; box is the (x, y, w, h)
+        of a real detection, or None when the detector fell back to the whole
+        frame (enforce_detection=False, exactly as DeepFace.analyze).
+        """
+        try:
+            faces = self._deepface.extract_faces(
+                img_path=frame,
+                detector_backend=self.detector_backend,
+                enforce_detection=False,
+                align=True,
+            )
+        except Exception:
+            return None, None
+        if not faces:
+            return None, None
+        face = faces[0]["face"]
+        if face.shape[0] == 0 or face.shape[1] == 0:
+            return None, None
+        area = faces[0].get("facial_area") or {}
+        box = None
+        if faces[0].get("confidence", 0) and all(k in area for k in ("x", "y", "w", "h")):
+            box = (int(area["x"]), int(area["y"]), int(area["w"]), int(area["h"]))
+        # extract_faces returns RGB in [0, 1]; the emotion model expects BGR padded to 224x224
+        return self._resize_image(img=face[:, :, ::-1], target_size=(224, 224))[0], box
+
+    def prepare(self, frame):
+        return self.detect(frame)[0]
+
+    def prepare_crop(self, frame, box):
+        """Model input for a known (x, y, w, h) face box, skipping detection."""
+        x, y, w, h = box
+        crop = frame[max(0, y):y + h, max(0, x):x + w]
+        if crop.size == 0:
+            return None
+        return self._resize_image(img=crop, target_size=(224, 224))[0]
+
+    def classify(self, faces) -> list[str]:
+        """Label prepared faces (None entries become "No face") with one batched forward pass."""
+        labels = ["No face"] * len(faces)
+        present = [i for i, f in enumerate(faces) if f is not None]
+        if not present:
+            return labels
+        try:
+            preds = np.asarray(self.model.predict(np.stack([faces[i] for i in present])))
+            preds = preds.reshape(len(present), -1)
+        except Exception:
+            return labels
+        for i, row in zip(present, preds):
+            labels[i] = self.labels[int(np.argmax(row))]
+        return labels
+
+    def detect_emotions(self, frames) -> list[str]:
+        return self.classify([self.prepare(f) for f in frames])
+
+    def detect_emotion(self, frame):
+        return self.detect_emotions([frame])[0]
+
+    def warmup(self):
+        """Push a blank frame through detection and classification to initialize both models."""
+        self.detect_emotion(np.zeros((480, 640, 3), dtype=np.uint8))
+
+
+def _create_tracker(kind: str):
+    import cv2
+
+    factories = {
+        "kcf": ("TrackerKCF_create",),
+        "csrt": ("TrackerCSRT_create",),
+        "mil": ("TrackerMIL_create",),
+    }
+    # KCF/CSRT ship with opencv-contrib (top level or cv2.legacy); MIL is always available
+    for name in factories.get(kind, ()) + ("TrackerMIL_create",):
+        for ns in (cv2, getattr(cv2, "legacy", None)):
+            factory = getattr(ns, name, None) if ns is not None else None
+            if factory is not None:
+                return factory()
+    return None
+
+
+class FaceTracker:
+    """
+    Wraps an EmotionDetector so that detection runs only every `detect_every`
+    frames; the frames in between reuse a tracked face box.
+    """
+
+    def __init__(self, detector, detect_every: int, kind: str | None = None):
+        self.detector = detector
+        self.detect_every = detect_every
+        self.kind = (kind or os.getenv("VIDEO_TRACKER", "kcf")).lower()
+        self.tracker = None
+        self.since_detect = 0
+        self.stats = {"detections": 0, "tracked": 0, "track_lost": 0}
+
+    def prepare(self, frame):
+        if self.tracker is not None and self.since_detect < self.detect_every - 1:
+            ok, box = self.tracker.update(frame)
+            if ok and _box_in_frame(box, frame.shape):
+                self.since_detect += 1
+                self.stats["tracked"] += 1
+                return self.detector.prepare_crop(frame, tuple(int(v) for v in box))
+            self.stats["track_lost"] += 1
+
+        face, box = self.detector.detect(frame)
+        self.stats["detections"] += 1
+        self.since_detect = 0
+        self.tracker = None
+        if box is not None:
+            tracker = _create_tracker(self.kind)
+            if tracker is not None:
+                try:
+                    tracker.init(frame, box)
+                    self.tracker = tracker
+                except Exception:
+                    self.tracker = None
+        return face
+
+
+def _box_in_frame(box, shape) -> bool:
+    x, y, w, h = box
+    height, width = shape[:2]
+    return w >= 8 and h >= 8 and x >= 0 and y >= 0 and x + w <= width and y + h <= height
+
+
+def _thumbnail(frame):
+    import cv2
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    return cv2.resize(gray, THUMB_SIZE, interpolation=cv2.INTER_AREA)
+
+
+def _decode_frames(cap, stride: int, diff_threshold: float, out: queue.Queue, stats: dict, stop: threading.Event):
+    """
+    Producer side of analyze_video: puts ("frame", image) for frames that need
+    a label and ("carry", None) for frames that reuse the previous one, then
+    ("end", None). Errors are forwarded as ("error", exc).
+    """
+    import cv2
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                out.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    last_thumb = None
+    sent_frame = False
+    try:
+        while not stop.is_set():
+            if stride > 1 and stats["frames"] % stride and sent_frame:
+                # grab() advances without decoding the frame into an image
+                if not cap.grab():
+                    break
+                stats["frames"] += 1
+                stats["skipped_by_fps"] += 1
+                put(("carry", None))
+                continue
+
+            ret, frame = cap.read()
+            if not ret:
+                break
+            stats["frames"] += 1
+
+            thumb = _thumbnail(frame) if diff_threshold > 0 else None
+            if (
+                thumb is not None
+                and last_thumb is not None
+                and float(np.mean(cv2.absdiff(thumb, last_thumb))) < diff_threshold
+            ):
+                stats["skipped_by_diff"] += 1
+                put(("carry", None))
+                continue
+
+            last_thumb = thumb
+            sent_frame = True
+            put(("frame", frame))
+    except Exception as e:
+        put(("error", e))
+    finally:
+        put(("end", None))
+
+
+def analyze_video(path: str, detector, target_fps: float | None = None, diff_threshold: float | None = None,
+                  batch_size: int | None = None, detect_every: int | None = None):
+    """
+    Return (emotions_per_frame, stats) for the video at `path`.
+    Raises ValueError if the file cannot be opened. Blocking; call it off the event loop.
+    """
+    import cv2
+
+    if target_fps is None:
+        target_fps = float(os.getenv("VIDEO_TARGET_FPS", "5"))
+    if diff_threshold is None:
+        diff_threshold = float(os.getenv("VIDEO_DIFF_THRESHOLD", "2.0"))
+    if batch_size is None:
+        batch_size = int(os.getenv("VIDEO_BATCH_SIZE", "16"))
+    if detect_every is None:
+        detect_every = int(os.getenv("VIDEO_DETECT_EVERY", "0"))
+    preparer = FaceTracker(detector, detect_every) if detect_every > 1 else detector
+
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise ValueError("Cannot open video file")
+
+    fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+    stride = max(1, int(round(fps / target_fps))) if target_fps > 0 and fps > 0 else 1
+
+    # sources[i] is the index (into `labels`) of the analyzed frame whose label frame i uses
+    sources, labels, pending = [], [], []
+    stats = {"frames": 0, "analyzed": 0, "skipped_by_fps": 0, "skipped_by_diff": 0, "stride": stride, "batches": 0}
+
+    def flush():
+        labels.extend(detector.classify(pending))
+        pending.clear()
+        stats["batches"] += 1
+
+    frames: queue.Queue = queue.Queue(maxsize=int(os.getenv("VIDEO_DECODE_QUEUE", "8")))
+    stop = threading.Event()
+    decoder = threading.Thread(
+        target=_decode_frames, args=(cap, stride, diff_threshold, frames, stats, stop),
+        name="video-decode", daemon=True,
+    )
+    decoder.start()
+    try:
+        while True:
+            kind, frame = frames.get()
+            if kind == "end":
+                break
+            if kind == "error":
+                raise frame
+            if kind == "carry":
+                sources.append(stats["analyzed"] - 1)
+                continue
+
+            pending.append(preparer.prepare(frame))
+            sources.append(stats["analyzed"])
+            stats["analyzed"] += 1
+            if len(pending) >= batch_size:
+                flush()
+        if pending:
+            flush()
+    finally:
+        stop.set()
+        decoder.join()
+        cap.release()
+
+    if isinstance(preparer, FaceTracker):
+        stats.update(preparer.stats)
+    return [labels[j] for j in sources], stats
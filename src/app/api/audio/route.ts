@@ -65,6 +65,7 @@ export async function POST(req: NextRequest) {
       mime,
       bytes: buf.length,
       s3Key: key, // Keeping s3Key field name for DB compatibility or rename later
+      generation: gcsFile.metadata.generation?.toString(),
       checksum,
       created_at: new Date(),
     });
@@ -12,6 +12,7 @@ export type AudioFrameDoc = {
   mime: SupportedAudioMime;
   bytes: number;
   s3Key?: string;
+  generation?: string;           // GCS object generation, keys the backend's decode caches
   gridFsId?: string;
   checksum?: string;
   created_at: Date;
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Validate backend/audio_preprocess.py against the pydub filter chain it replaces.
+Runs on synthetic audio; needs numpy, scipy and pydub (no ffmpeg, no network).
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+SR = 16000
+# Largest allowed difference per stage, in int16 steps (pydub truncates to int after every sample)
+TOLERANCE_LSB = 4
+
+
+def synthetic_speechlike(seconds=4.0, seed=0):
+    """Voiced bursts with pauses, a DC offset and some hum, as floats in [-1, 1]."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * SR)) / SR
+    envelope = (np.sin(2 * np.pi * 1.5 * t) > -0.2) * (0.3 + 0.7 * np.abs(np.sin(2 * np.pi * 0.4 * t)))
+    voice = np.sin(2 * np.pi * 180 * t) + 0.5 * np.sin(2 * np.pi * 360 * t) + 0.2 * rng.standard_normal(len(t))
+    x = 0.6 * envelope * voice + 0.05 * np.sin(2 * np.pi * 50 * t) + 0.02
+    return np.clip(x / np.max(np.abs(x)) * 0.8, -1, 1)
+
+
+def to_segment(x):
+    from pydub import AudioSegment
+    samples = np.clip(np.round(x * 32768), -32768, 32767).astype("<i2")
+    return AudioSegment(samples.tobytes(), sample_width=2, frame_rate=SR, channels=1)
+
+
+def samples_of(seg):
+    return np.frombuffer(seg.raw_data, dtype="<i2").astype(np.float64)
+
+
+def max_diff(name, expected_seg, actual) -> float:
+    """Largest per-sample difference between pydub's output and ours, in int16 steps."""
+    expected = samples_of(expected_seg)
+    actual = np.asarray(actual, dtype=np.float64) * 32768
+    assert len(expected) == len(actual), f"{name}: {len(actual)} samples, pydub has {len(expected)}"
+    diff = np.abs(expected - actual)
+    print(f"{name}: max |diff| = {diff.max():.2f} LSB, mean = {diff.mean():.3f} LSB")
+    return float(diff.max())
+
+
+def test_stages_match_pydub():
+    """Each stage, fed the same int16 input, matches pydub within TOLERANCE_LSB."""
+    from pydub import effects
+    from pydub.effects import high_pass_filter, low_pass_filter, compress_dynamic_range
+    import audio_preprocess as ap
+
+    print("Comparing each preprocessing stage with pydub...")
+    seg = to_segment(synthetic_speechlike())
+    x = samples_of(seg) / 32768
+
+    assert max_diff("high_pass(100)", high_pass_filter(seg, cutoff=100), ap.high_pass(x, SR, 100)) <= TOLERANCE_LSB
+    assert max_diff("low_pass(8000)", low_pass_filter(seg, cutoff=8000), ap.low_pass(x, SR, 8000)) <= TOLERANCE_LSB
+    assert max_diff("normalize", effects.normalize(seg), ap.normalize(x)) <= TOLERANCE_LSB
+    assert max_diff(
+        "compress(-20dB, 4:1, 5/50ms)",
+        compress_dynamic_range(seg, threshold=-20.0, ratio=4.0, attack=5, release=50),
+        ap.compress(x, SR, threshold=-20.0, ratio=4.0, attack=5, release=50),
+    ) <= TOLERANCE_LSB
+
+
+def test_full_chain_matches_pydub():
+    """The whole chain stays close to pydub's (errors compound a little across stages)."""
+    from pydub import effects
+    from pydub.effects import high_pass_filter, low_pass_filter, compress_dynamic_range
+    import audio_preprocess as ap
+
+    print("Comparing the full chain with pydub...")
+    seg = to_segment(synthetic_speechlike(seconds=3.0, seed=1))
+
+    t0 = time.time()
+    ref = high_pass_filter(seg, cutoff=100)
+    ref = low_pass_filter(ref, cutoff=8000)
+    ref = effects.normalize(ref)
+    ref = compress_dynamic_range(ref, threshold=-20.0, ratio=4.0, attack=5, release=50)
+    pydub_s = time.time() - t0
+
+    ap.preprocess_pcm(samples_of(seg)[:SR] / 32768, SR)  # compile the numba loop outside the timing
+    t0 = time.time()
+    out = ap.preprocess_pcm(samples_of(seg) / 32768, SR)
+    numpy_s = time.time() - t0
+
+    print(f"  pydub {pydub_s * 1000:.0f} ms, numpy {numpy_s * 1000:.1f} ms for {len(seg) / 1000:.1f}s of audio")
+    assert max_diff("full chain", ref, out) <= 4 * TOLERANCE_LSB
+
+
+if __name__ == "__main__":
+    test_stages_match_pydub()
+    test_full_chain_matches_pydub()
+    print("✓ audio_preprocess matches pydub")
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Tests for backend/embedding_cache.py with a fake encoder (numpy only, no
+SentenceTransformer). Run with pytest or directly.
+"""
+
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+import embedding_cache  # noqa: E402
+from embedding_cache import EmbeddingCache  # noqa: E402
+
+
+class FakeEncoder:
+    """Embeds a text as (length, number of capitals) and records every call."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        return np.array([[len(t), sum(c.isupper() for c in t)] for t in texts], dtype=np.float32)
+
+
+def test_whitespace_variants_share_an_entry_but_case_does_not():
+    cache = EmbeddingCache(max_size=16, path="")
+    encoder = FakeEncoder()
+    cache.encode(["feeling anxious today"], encoder)
+    cache.encode(["  feeling\tanxious \n today "], encoder)
+    assert encoder.calls == [["feeling anxious today"]]
+    cache.encode(["Feeling Anxious Today"], encoder)
+    assert encoder.calls[-1] == ["Feeling Anxious Today"]
+    assert len(cache) == 2
+
+
+def test_duplicated_misses_are_encoded_once():
+    cache = EmbeddingCache(max_size=16, path="")
+    encoder = FakeEncoder()
+    out = cache.encode(["a b", "c", "a  b", "c", "D"], encoder)
+    assert encoder.calls == [["a b", "c", "D"]]
+    assert out.shape == (5, 2)
+    assert np.array_equal(out[0], out[2]) and np.array_equal(out[1], out[3])
+    # every row is a copy, so callers may normalize it in place
+    out[0] = 0
+    assert cache.get("a b")[0] == 3
+
+
+def test_lru_eviction():
+    cache = EmbeddingCache(max_size=2, path="")
+    encoder = FakeEncoder()
+    cache.encode(["one", "two"], encoder)
+    cache.get("one")
+    cache.encode(["three"], encoder)
+    assert cache.get("two") is None
+    assert cache.get("one") is not None
+
+
+def test_save_and_load_round_trip():
+    path = os.path.join(tempfile.mkdtemp(), "embeddings.npz")
+    cache = EmbeddingCache(max_size=16, path=path)
+    cache.encode(["x", "yy"], FakeEncoder())
+    cache.save()
+    restored = EmbeddingCache(max_size=16, path=path)
+    assert restored.load() == 2
+    assert np.array_equal(restored.get("yy"), [2, 0])
+
+
+def test_files_with_another_key_format_are_ignored():
+    path = os.path.join(tempfile.mkdtemp(), "embeddings.npz")
+    keys, vectors = np.array(["old key"]), np.zeros((1, 2), dtype=np.float32)
+    # written before key_format existed (format 1, lower-cased keys)
+    np.savez(path, keys=keys, vectors=vectors)
+    assert EmbeddingCache(max_size=16, path=path).load() == 0
+    np.savez(path, keys=keys, vectors=vectors, key_format=np.array(embedding_cache.KEY_FORMAT + 1))
+    assert EmbeddingCache(max_size=16, path=path).load() == 0
+    np.savez(path, keys=keys, vectors=vectors, key_format=np.array(embedding_cache.KEY_FORMAT))
+    assert EmbeddingCache(max_size=16, path=path).load() == 1
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_"):
+            fn()
+            print(f"✓ {name}")
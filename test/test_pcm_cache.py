@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Tests for backend/pcm_cache.py: byte accounting, LRU eviction and hit recency,
+on a temporary directory (numpy only). Run with pytest or directly.
+"""
+
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+import pcm_cache  # noqa: E402
+
+N = 1000  # samples per cached object
+
+
+def pcm(value, n=N):
+    return np.full(n, value, dtype=np.float32)
+
+
+def entry_size(n=N):
+    """Bytes one cached object of n samples takes on disk (.npy header included)."""
+    cache = pcm_cache.PCMCache(tempfile.mkdtemp(), max_bytes=1 << 30)
+    cache.put("b", "probe", 1, pcm(0, n))
+    return cache.stats()["bytes"]
+
+
+def age(cache, key, seconds_ago):
+    """Backdate an entry's mtime, which is what eviction orders by."""
+    path = cache._path("b", key, 1)
+    t = os.path.getmtime(path) - seconds_ago
+    os.utime(path, (t, t))
+
+
+def test_round_trip_and_counters():
+    cache = pcm_cache.PCMCache(tempfile.mkdtemp(), max_bytes=1 << 20)
+    assert cache.get("b", "a", 1) is None
+    cache.put("b", "a", 1, pcm(0.5))
+    out = cache.get("b", "a", 1)
+    assert out.dtype == np.float32 and np.all(out == 0.5)
+    assert cache.get("b", "a", 2) is None  # another generation is another entry
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 2)
+
+
+def test_eviction_keeps_bytes_under_the_limit():
+    size = entry_size()
+    cache = pcm_cache.PCMCache(tempfile.mkdtemp(), max_bytes=4 * size - 1)
+    for i, key in enumerate("abc"):
+        cache.put("b", key, 1, pcm(i))
+        age(cache, key, 100 - i)
+    assert cache.stats()["evictions"] == 0
+    cache.put("b", "d", 1, pcm(3))  # fourth entry crosses the limit
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["bytes"] == 3 * size <= cache.max_bytes
+    assert cache.get("b", "a", 1) is None  # the oldest went first
+    assert all(cache.get("b", key, 1) is not None for key in "bcd")
+
+
+def test_overwrite_counts_only_the_size_difference():
+    size = entry_size()
+    cache = pcm_cache.PCMCache(tempfile.mkdtemp(), max_bytes=1 << 20)
+    cache.put("b", "a", 1, pcm(0))
+    cache.put("b", "a", 1, pcm(1))
+    assert cache.stats()["bytes"] == size
+    cache.put("b", "a", 1, pcm(2, n=2 * N))
+    assert cache.stats()["bytes"] == entry_size(2 * N)
+    # the running total matches what a fresh scan of the directory finds
+    assert pcm_cache.PCMCache(cache.directory, max_bytes=1 << 20).stats()["bytes"] == cache.stats()["bytes"]
+    assert np.all(cache.get("b", "a", 1) == 2)
+
+
+def test_hit_refreshes_recency():
+    size = entry_size()
+    cache = pcm_cache.PCMCache(tempfile.mkdtemp(), max_bytes=4 * size - 1)
+    for i, key in enumerate("abc"):
+        cache.put("b", key, 1, pcm(i))
+        age(cache, key, 100 - i)
+    assert cache.get("b", "a", 1) is not None  # "a" becomes the most recently used
+    cache.put("b", "d", 1, pcm(3))
+    assert cache.get("b", "b", 1) is None
+    assert cache.get("b", "a", 1) is not None
+
+
+def test_oversized_and_disabled_are_not_stored():
+    cache = pcm_cache.PCMCache(tempfile.mkdtemp(), max_bytes=100)
+    cache.put("b", "a", 1, pcm(0))
+    assert cache.get("b", "a", 1) is None
+    disabled = pcm_cache.PCMCache(tempfile.mkdtemp(), max_bytes=0)
+    assert disabled.get_or_decode("b", "a", 1, lambda: pcm(1))[0] == 1
+    assert disabled.get("b", "a", 1) is None
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_"):
+            fn()
+            print(f"✓ {name}")
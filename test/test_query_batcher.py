@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Tests for backend/query_batcher.py with plain Python batch functions (no model
+or index needed). Run with pytest or directly.
+"""
+
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+from query_batcher import MicroBatcher  # noqa: E402
+
+
+class Recorder:
+    """batch_fn that doubles its inputs and remembers every batch it was given."""
+
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, items):
+        self.batches.append(list(items))
+        return [x * 2 for x in items]
+
+
+def test_items_within_the_wait_window_share_a_batch():
+    fn = Recorder()
+    batcher = MicroBatcher(fn, max_batch=8, max_wait_ms=200)
+    futures = [batcher.submit(i) for i in range(5)]
+    assert [f.result(timeout=5) for f in futures] == [0, 2, 4, 6, 8]
+    assert fn.batches == [[0, 1, 2, 3, 4]]
+    batcher.close()
+
+
+def test_batches_are_capped_at_max_batch():
+    fn = Recorder()
+    release = threading.Event()
+
+    def gated(items):
+        release.wait(5)
+        return fn(items)
+
+    batcher = MicroBatcher(gated, max_batch=2, max_wait_ms=50)
+    futures = [batcher.submit(i) for i in range(5)]
+    release.set()
+    assert [f.result(timeout=5) for f in futures] == [0, 2, 4, 6, 8]
+    assert all(len(b) <= 2 for b in fn.batches)
+    assert sum(fn.batches, []) == [0, 1, 2, 3, 4]
+    assert batcher.stats()["items"] == 5
+    batcher.close()
+
+
+def test_batch_fn_errors_reach_every_caller():
+    def boom(items):
+        raise ValueError("index unavailable")
+
+    batcher = MicroBatcher(boom, max_batch=8, max_wait_ms=100)
+    futures = [batcher.submit(i) for i in range(3)]
+    for f in futures:
+        try:
+            f.result(timeout=5)
+        except ValueError as e:
+            assert "index unavailable" in str(e)
+        else:
+            raise AssertionError("expected ValueError")
+    # the worker keeps serving after a failed batch
+    batcher.batch_fn = Recorder()
+    assert batcher(7, timeout=5) == 14
+    batcher.close()
+
+
+def test_short_results_fail_instead_of_leaving_callers_waiting():
+    batcher = MicroBatcher(lambda items: items[:-1], max_batch=8, max_wait_ms=100)
+    futures = [batcher.submit(i) for i in range(3)]
+    for f in futures:
+        try:
+            f.result(timeout=5)
+        except RuntimeError as e:
+            assert "2 results for 3 items" in str(e)
+        else:
+            raise AssertionError("expected RuntimeError")
+    batcher.close()
+
+
+def test_close_serves_queued_items_then_rejects_new_ones():
+    fn = Recorder()
+    batcher = MicroBatcher(fn, max_batch=8, max_wait_ms=1000)
+    futures = [batcher.submit(i) for i in range(3)]
+    batcher.close()  # does not wait out the 1 s window
+    assert [f.result(timeout=0) for f in futures] == [0, 2, 4]
+    try:
+        batcher.submit(3)
+    except RuntimeError:
+        pass
+    else:
+        raise AssertionError("submit after close should raise")
+
+
+def test_close_fails_requests_it_cannot_reach():
+    started, release = threading.Event(), threading.Event()
+
+    def slow(items):
+        started.set()
+        release.wait(5)
+        return items
+
+    batcher = MicroBatcher(slow, max_batch=1, max_wait_ms=0)
+    running = batcher.submit("running")
+    assert started.wait(5)
+    pending = [batcher.submit(i) for i in range(2)]
+    batcher.close(timeout=0.05)  # worker is stuck in the first batch
+    for f in pending:
+        assert f.done()
+        assert isinstance(f.exception(timeout=0), RuntimeError)
+    release.set()
+    assert running.result(timeout=5) == "running"
+    batcher._thread.join(5)
+    assert not batcher._thread.is_alive()
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_"):
+            fn()
+            print(f"✓ {name}")
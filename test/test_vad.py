@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Tests for backend/vad.py on synthetic tone-plus-silence signals (numpy only).
+Run with pytest or directly.
+"""
+
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+import vad  # noqa: E402
+
+SR = 16000
+
+
+def tone(seconds, freq=220.0, amp=0.5):
+    t = np.arange(int(seconds * SR)) / SR
+    return (amp * np.sin(2 * np.pi * freq * t)).astype(np.float32)
+
+
+def silence(seconds, seed=0):
+    return (0.0005 * np.random.default_rng(seed).standard_normal(int(seconds * SR))).astype(np.float32)
+
+
+def test_silence_and_empty_give_no_requests():
+    assert vad.segment_pcm(np.zeros(0, dtype=np.float32), SR) == []
+    assert vad.segment_pcm(silence(5), SR) == []
+    assert vad.segment_pcm(np.zeros(SR * 3, dtype=np.float32), SR) == []
+
+
+def test_silence_is_dropped_and_pauses_bridged():
+    x = np.concatenate([silence(2), tone(3), silence(0.2, 1), tone(2), silence(4, 2), tone(1), silence(2, 3)])
+    regions, _, _ = vad.speech_regions(x, SR)
+    # the 0.2 s pause is shorter than VAD_MIN_SILENCE_MS, the 4 s one is not
+    assert len(regions) == 2
+    pad = SR * vad.PAD_MS // 1000
+    assert abs(regions[0][0] - (2 * SR - pad)) <= SR * vad.FRAME_MS // 1000
+
+    parts = vad.segment_pcm(x, SR, max_sec=30)
+    assert len(parts) == 1  # both regions packed into one request
+    speech, frame = 6.2 * SR, SR * vad.FRAME_MS // 1000
+    # speech plus each region's padding, give or take a frame at every region edge
+    assert speech <= len(parts[0]) <= speech + 4 * (pad + frame)
+
+
+def test_short_blips_are_dropped():
+    x = np.concatenate([silence(2), tone(0.06), silence(2, 1), tone(1), silence(1, 2)])
+    regions, _, _ = vad.speech_regions(x, SR)
+    assert len(regions) == 1
+    assert regions[0][0] > 3 * SR
+
+
+def test_padding_is_clipped_to_the_signal():
+    x = np.concatenate([tone(1), silence(2), tone(1)])
+    regions, _, _ = vad.speech_regions(x, SR)
+    assert regions[0][0] == 0
+    assert regions[-1][1] == len(x)
+    parts = vad.segment_pcm(x, SR, max_sec=30)
+    assert sum(len(p) for p in parts) < len(x)
+
+
+def test_long_speech_is_split_within_the_limit():
+    # 70 s of speech with a short dip every 5 s; no request may exceed max_sec
+    pieces = []
+    for i in range(14):
+        pieces += [tone(4.9, amp=0.5), tone(0.1, amp=0.02)]
+    x = np.concatenate(pieces)
+    parts = vad.segment_pcm(x, SR, max_sec=20)
+    assert len(parts) >= 4
+    assert all(len(p) <= 20 * SR for p in parts)
+    assert sum(len(p) for p in parts) == len(x)  # nothing dropped or duplicated
+
+
+def test_pack_fills_requests_greedily():
+    regions = [(0, 10), (20, 35), (40, 50), (60, 100)]
+    assert vad.pack(regions, 30) == [[(0, 10), (20, 35)], [(40, 50)], [(60, 100)]]
+    assert vad.pack([], 30) == []
+
+
+def test_config_key_tracks_settings():
+    key = vad.config_key()
+    original = vad.MARGIN_DB
+    try:
+        vad.MARGIN_DB = original + 3
+        assert vad.config_key() != key
+    finally:
+        vad.MARGIN_DB = original
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_"):
+            fn()
+            print(f"✓ {name}")
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Tests for the frame skip / carry-forward logic of backend/video_emotion.py.
+Writes small synthetic clips with OpenCV and labels frames with a fake
+detector (no DeepFace or TensorFlow needed). Run with pytest or directly.
+"""
+
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+import video_emotion  # noqa: E402
+
+STEP = 12  # brightness step between frame levels, well above JPEG error
+
+
+class BrightnessDetector:
+    """Stands in for EmotionDetector: the "face" is the frame's mean brightness level."""
+
+    def __init__(self):
+        self.batches = []
+
+    def prepare(self, frame):
+        return int(round((float(frame.mean()) - 10) / STEP))
+
+    def classify(self, faces):
+        self.batches.append(len(faces))
+        return [f"level{f}" for f in faces]
+
+
+def write_clip(levels, fps=10.0):
+    """An MJPG clip with one flat grey frame per entry of `levels`; returns its path."""
+    import cv2
+
+    path = os.path.join(tempfile.mkdtemp(), "clip.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), fps, (64, 48))
+    for level in levels:
+        writer.write(np.full((48, 64, 3), 10 + STEP * level, dtype=np.uint8))
+    writer.release()
+    return path
+
+
+def test_unchanged_frames_carry_the_last_label():
+    levels = [0] * 10 + [15] * 10
+    labels, stats = video_emotion.analyze_video(
+        write_clip(levels), BrightnessDetector(), target_fps=0, diff_threshold=2.0, batch_size=16)
+    assert labels == ["level0"] * 10 + ["level15"] * 10
+    assert stats["frames"] == 20
+    assert stats["analyzed"] == 2
+    assert stats["skipped_by_diff"] == 18
+
+
+def test_fps_stride_carries_across_batches():
+    levels = list(range(17))
+    detector = BrightnessDetector()
+    labels, stats = video_emotion.analyze_video(
+        write_clip(levels, fps=10.0), detector, target_fps=5, diff_threshold=0, batch_size=3)
+    # stride 2: every even frame is analyzed, the odd frame after it reuses its label
+    assert stats["stride"] == 2
+    assert labels == [f"level{i - i % 2}" for i in levels]
+    assert stats["analyzed"] == 9
+    assert stats["skipped_by_fps"] == 8
+    assert detector.batches == [3, 3, 3]
+
+
+def test_every_frame_gets_a_label():
+    levels = [0, 0, 5, 5, 5, 10, 0, 0]
+    labels, stats = video_emotion.analyze_video(
+        write_clip(levels), BrightnessDetector(), target_fps=0, diff_threshold=2.0, batch_size=2)
+    assert len(labels) == len(levels) == stats["frames"]
+    assert labels == [f"level{v}" for v in levels]
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_"):
+            fn()
+            print(f"✓ {name}")